@@ -1,44 +1,368 @@
+import argparse
+import multiprocessing
 import os
 import sys
+from typing import Iterable
 
-from src.analysis import Advice, get_advice
+from src.analysis import Advice, ChartMode, get_advice
+from src.batch import DEFAULT_WORKERS, fetch_requests
+from src.browser import DEFAULT_MAX_USES, BrowserPool
+from src.cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_HOURS
+from src.flex import fetch_grids, get_grid_advice
 from src.flights import (
     FlightRequest,
-    get_parsed_flights,
+    configure_cache,
+    configure_history,
+    configure_provider,
+    configure_rate_limit,
 )
-from src.input import merge_sheets, parse_df
+from src.history import DEFAULT_MAX_AGE_HOURS
+from src.input import iter_requests
+from src.instrumentation import count, instrumentation, span
+from src.journal import RunJournal
+from src.nearby import DEFAULT_MAX_ALTERNATIVES, fetch_nearby, get_nearby_advice
 from src.output import convert_advices_to_typst_pdf
+from src.provider import (
+    AdaptiveProvider,
+    FlightProvider,
+    RecordingProvider,
+    ReplayProvider,
+    make_backend,
+)
+from src.ratelimit import DEFAULT_BURST, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_RETRIES
+from src.render import DEFAULT_RENDER_WORKERS, Renderer
+from src.server import DEFAULT_HOST, serve
+from src.util import get_cache_path
 
 
-def analyze_request(requests: list[tuple[str, FlightRequest | None]]) -> list[Advice]:
+def analyze_request(
+    requests: Iterable[tuple[str, FlightRequest | None]],
+    max_workers: int = DEFAULT_WORKERS,
+    render_workers: int = DEFAULT_RENDER_WORKERS,
+    charts: ChartMode = "png",
+    journal: RunJournal | None = None,
+    flex_days: int = 0,
+    nearby_km: float = 0,
+    nearby_max: int = DEFAULT_MAX_ALTERNATIVES,
+) -> list[Advice]:
     advices = []
-    for i, (name, request) in enumerate(requests):
-        if request is None:
-            continue
-        filename = f"{i}_{name.replace(' ', '_')}.png"
-        flights_now, buying_time, avg_duration = get_parsed_flights(request)
-        advice = get_advice(
-            flights_now, filename, name, request, buying_time, avg_duration
-        )
-        advices.append(advice)
+    if charts == "typst":
+        render_workers = 0
+    if flex_days > 0 or nearby_km > 0:
+        if flex_days > 0:
+            rows = fetch_grids(requests, flex_days, max_workers)
+            get_expanded_advice = get_grid_advice
+        else:
+            rows = fetch_nearby(requests, nearby_km, nearby_max, max_workers)
+            get_expanded_advice = get_nearby_advice
+        with Renderer(render_workers) as renderer:
+            for i, name, request, expansion, results in rows:
+                filename = f"{i}_{name.replace(' ', '_')}.png"
+                try:
+                    with span("advice"):
+                        advice = get_expanded_advice(
+                            expansion,
+                            results,
+                            filename,
+                            name,
+                            request,
+                            renderer,
+                            charts,
+                        )
+                except Exception as e:
+                    print(f"Could not make an advice for {name}: {e!r}. Skipping...")
+                    advice = None
+                if advice is None:
+                    count("rows_skipped")
+                    continue
+                advices.append(advice)
+        return advices
+    lookup = journal.get if journal else None
+    with Renderer(render_workers) as renderer:
+        for i, name, request, result in fetch_requests(requests, max_workers, lookup):
+            if result is None:
+                count("rows_skipped")
+                continue
+            filename = f"{i}_{name.replace(' ', '_')}.png"
+            flights_now, buying_time, avg_duration = result
+            if not len(flights_now):
+                print(f"No flights found for {name}. Skipping...")
+                count("rows_skipped")
+                continue
+            try:
+                with span("advice"):
+                    advice = get_advice(
+                        flights_now,
+                        filename,
+                        name,
+                        request,
+                        buying_time,
+                        avg_duration,
+                        renderer,
+                        charts,
+                    )
+            except Exception as e:
+                print(f"Could not make an advice for {name}: {e!r}. Skipping...")
+                count("rows_skipped")
+                continue
+            if journal and not journal.is_finished(name, request):
+                journal.append(name, request, result, advice)
+            advices.append(advice)
     return advices
 
 
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Home Leave Allowance Tool")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Maximum number of flight lookups running at the same time. Use 1 to run serially.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["auto", "http", "browser"],
+        default="auto",
+        help="Search with plain HTTP requests, a headless browser, or HTTP first and the browser when HTTP fails (auto).",
+    )
+    parser.add_argument(
+        "--browser-recycle",
+        type=int,
+        default=DEFAULT_MAX_USES,
+        metavar="N",
+        help="Replace a browser context after N flight lookups.",
+    )
+    parser.add_argument(
+        "--render-workers",
+        type=int,
+        default=DEFAULT_RENDER_WORKERS,
+        help="Number of processes that draw the plots. Use 0 to draw them in the main process.",
+    )
+    parser.add_argument(
+        "--charts",
+        choices=["png", "typst"],
+        default="png",
+        help="Draw the plots with matplotlib (png) or let Typst draw them in the report (typst).",
+    )
+    parser.add_argument(
+        "--flex-days",
+        type=int,
+        default=0,
+        help="Also search departure and return dates up to this many days earlier or later.",
+    )
+    parser.add_argument(
+        "--nearby",
+        type=float,
+        default=0,
+        metavar="KM",
+        help="Also search from and to other airports within KM kilometres, and merge their flights.",
+    )
+    parser.add_argument(
+        "--nearby-max",
+        type=int,
+        default=DEFAULT_MAX_ALTERNATIVES,
+        help="Maximum number of other airports searched at each end of the trip.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the previous run: rows it finished are not searched again.",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL_HOURS,
+        help="Hours a cached flight search stays valid.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help="Maximum number of cached flight searches.",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_REQUESTS_PER_MINUTE,
+        help="Maximum number of flight lookups per minute.",
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=DEFAULT_BURST,
+        help="Number of flight lookups that may start at once before --rate applies.",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="How often a failed or empty flight lookup is retried.",
+    )
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument(
+        "--no-cache",
+        dest="cache_mode",
+        action="store_const",
+        const="bypass",
+        default="use",
+        help="Do not read or write cached flight searches.",
+    )
+    cache_mode.add_argument(
+        "--refresh-cache",
+        dest="cache_mode",
+        action="store_const",
+        const="refresh",
+        help="Search all flights again and overwrite the cached results.",
+    )
+    parser.add_argument(
+        "--history-max-age",
+        type=float,
+        default=DEFAULT_MAX_AGE_HOURS,
+        metavar="HOURS",
+        help="Use flights from the price history instead of searching again if they were fetched less than HOURS ago.",
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Do not add the flights of this run to the price history.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print how long every stage of the run took.",
+    )
+    parser.add_argument(
+        "--stats-export",
+        metavar="FILE",
+        help="Write the stage timings and counters to FILE, as Prometheus text if it ends in .prom and as JSON otherwise.",
+    )
+    provider = parser.add_mutually_exclusive_group()
+    provider.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Save the results of all flight searches to FILE for --replay.",
+    )
+    provider.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="Serve flight searches from a file made with --record instead of Google Flights.",
+    )
+    parser.add_argument(
+        "--replay-latency",
+        type=float,
+        default=0.0,
+        help="Seconds every replayed flight search takes.",
+    )
+    parser.add_argument(
+        "--replay-error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of replayed flight searches that fail.",
+    )
+    parser.add_argument(
+        "--replay-throttle-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of replayed flight searches that are refused as too many requests.",
+    )
+    parser.add_argument(
+        "--replay-rate-limit",
+        type=float,
+        help="Refuse replayed flight searches above this number per minute.",
+    )
+    parser.add_argument(
+        "--serve",
+        type=int,
+        metavar="PORT",
+        help="Keep running and answer flight requests over HTTP on PORT instead of reading the input sheets.",
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help="Address the --serve API listens on.",
+    )
+    args = parser.parse_args(argv)
+    if args.flex_days > 0 and args.nearby > 0:
+        parser.error("--flex-days and --nearby cannot be combined")
+    return args
+
+
+def setup_provider(args: argparse.Namespace, pool: BrowserPool) -> FlightProvider:
+    live = make_backend(args.backend, pool)
+    if args.record:
+        configure_provider(RecordingProvider(args.record, live))
+    elif args.replay:
+        configure_provider(
+            ReplayProvider(
+                args.replay,
+                latency=args.replay_latency,
+                error_rate=args.replay_error_rate,
+                throttle_rate=args.replay_throttle_rate,
+                max_requests_per_minute=args.replay_rate_limit,
+            ),
+            cache_dir=os.path.join(get_cache_path(), "replay"),
+        )
+    else:
+        configure_provider(live)
+    return live
+
+
 def main():
+    args = parse_args()
+    instrumentation.enabled = args.stats or args.stats_export is not None
     print("Hello from flight-calculator!")
     # ensure playwright is installed correctly
     if getattr(sys, "frozen", False):
         os.environ["PLAYWRIGHT_BROWSERS_PATH"] = os.path.join(
             os.path.dirname(__file__), "playwright_browsers"
         )
-    sheets = merge_sheets()
-    requests = parse_df(sheets)
-    print("Analyzing requests...")
-    advices = analyze_request(requests)
+    with BrowserPool(args.workers, args.browser_recycle) as pool:
+        live = setup_provider(args, pool)
+        configure_cache(args.cache_ttl, args.cache_size, args.cache_mode)
+        # searching everything again should not be answered from the history either
+        max_age = args.history_max_age if args.cache_mode == "use" else 0
+        configure_history(max_age, record=not args.no_history)
+        limiter = configure_rate_limit(args.rate, args.burst, args.retries)
+        if args.serve is not None:
+            serve(args.host, args.serve, args.workers)
+            print(f"Flight provider: {limiter.metrics.summary()}")
+            return
+        advices = run(args)
+    print(f"Flight provider: {limiter.metrics.summary()}")
+    if isinstance(live, AdaptiveProvider) and not args.replay:
+        print(f"Fetch backends: {live.summary()}")
     print("Creating PDF report...")
     # create_pdf(advices)
     convert_advices_to_typst_pdf(advices)
+    if args.stats:
+        print(instrumentation.summary())
+    if args.stats_export:
+        instrumentation.export(args.stats_export)
+
+
+def run(args: argparse.Namespace) -> list[Advice]:
+    requests = iter_requests()
+    journal = RunJournal(resume=args.resume)
+    if (args.flex_days > 0 or args.nearby > 0) and args.resume:
+        print(
+            "Flexible dates and nearby airports are not journaled, "
+            "--resume searches all rows again."
+        )
+    if journal.finished:
+        print(f"Resuming: {len(journal.finished)} rows were already finished.")
+    print("Analyzing requests...")
+    return analyze_request(
+        requests,
+        args.workers,
+        args.render_workers,
+        args.charts,
+        journal,
+        args.flex_days,
+        args.nearby,
+        args.nearby_max,
+    )
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
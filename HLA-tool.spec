@@ -34,8 +34,10 @@ a = Analysis(
     binaries=[(typst_path, "bin")],
     datas=[
         ('src/resources/airports.csv', 'src/resources'),
+        ('src/resources/airports.pickle', 'src/resources'),
         ('src/templates/report.md', 'src/templates'),
         ('src/templates/report.typ', 'src/templates'),
+        ('src/templates/plot.typ', 'src/templates'),
         *browser_datas
     ],
 )
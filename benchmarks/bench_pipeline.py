@@ -0,0 +1,93 @@
+"""
+Benchmarks the whole pipeline, from parsed input rows to advices, against a replayed
+flight provider, so it runs offline and in CI.
+
+    python -m benchmarks.bench_pipeline --rows 2000 --workers 8 --latency 0.05
+
+The replayed searches come from the synthetic fixtures, and all rows get one of
+them. Prices are converted with the fixed exchange rates of the fixtures. The cache is bypassed, so every distinct search goes through the rate limiter
+and the replayed provider.
+"""
+
+import argparse
+import importlib.util
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from fast_flights import Result
+
+from benchmarks.fixtures import make_flights, make_sheet, use_fixed_rates
+from src.cache import dump_result
+from src.flights import configure_cache, configure_provider, configure_rate_limit
+from src.input import parse_df
+from src.instrumentation import instrumentation
+from src.provider import ReplayProvider
+
+ROOT = Path(__file__).parent.parent
+
+
+def load_tool():
+    spec = importlib.util.spec_from_file_location("hla_tool", ROOT / "HLA-tool.py")
+    module = importlib.util.module_from_spec(spec)  # type: ignore
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+def write_recordings(path: Path, count: int = 20, flights: int = 150) -> None:
+    with open(path, "w") as f:
+        for seed in range(count):
+            entry = dump_result(
+                Result(current_price="typical", flights=make_flights(flights, seed))
+            )
+            entry["key"] = f"{seed:064x}"
+            f.write(json.dumps(entry) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=60000)
+    parser.add_argument("--burst", type=int, default=100)
+    args = parser.parse_args()
+
+    instrumentation.enabled = True
+    use_fixed_rates()
+    tool = load_tool()
+    with tempfile.TemporaryDirectory() as directory:
+        recordings = Path(directory) / "recordings.jsonl"
+        write_recordings(recordings)
+        configure_provider(
+            ReplayProvider(
+                str(recordings),
+                latency=args.latency,
+                error_rate=args.error_rate,
+                throttle_rate=args.throttle_rate,
+                seed=0,
+            ),
+            cache_dir=directory,
+        )
+        configure_cache(mode="bypass")
+        limiter = configure_rate_limit(args.rate, args.burst, retries=3)
+        limiter.base_delay = 0.01
+
+        requests = parse_df(make_sheet(args.rows))
+        start = time.perf_counter()
+        advices = tool.analyze_request(requests, args.workers, charts="typst")
+        seconds = time.perf_counter() - start
+
+    print(
+        f"{len(advices)}/{args.rows} rows in {seconds:.2f}s "
+        f"({args.rows / seconds:.1f} rows/s) with {args.workers} workers"
+    )
+    print(f"Flight provider: {limiter.metrics.summary()}")
+    print(instrumentation.summary())
+
+
+if __name__ == "__main__":
+    main()
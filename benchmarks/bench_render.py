@@ -0,0 +1,106 @@
+"""
+Benchmarks rendering the Pareto plots of many advices.
+
+    python -m benchmarks.bench_render --advices 500
+
+Each mode runs in a fresh process, so the peak RSS of one mode does not leak into
+the next one. Peak RSS is only available on Unix-like systems.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from src.analysis import pareto_mask
+from src.render import PlotJob, Renderer
+
+MODES = {"inline": 0, "pool": 4}
+
+
+def peak_rss_mb() -> dict[str, float | None]:
+    try:
+        import resource
+    except ImportError:
+        return {"self": None, "children": None}
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+def make_jobs(count: int, directory: str, flights: int = 150) -> list[PlotJob]:
+    rng = np.random.default_rng(0)
+    jobs = []
+    for i in range(count):
+        minutes = rng.integers(60, 2000, flights)
+        prices = rng.normal(800, 200, flights).round(2)
+        mask = pareto_mask(prices, minutes)
+        order = np.argsort(minutes[mask])
+        jobs.append(
+            PlotJob(
+                minutes,
+                prices,
+                minutes[mask][order],
+                prices[mask][order],
+                f"{directory}/{i}.png",
+                f"AMS-JFK {i}: Price vs Duration",
+            )
+        )
+    return jobs
+
+
+def run_mode(mode: str, advices: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = make_jobs(advices, directory)
+        start = time.perf_counter()
+        with Renderer(MODES[mode]) as renderer:
+            for job in jobs:
+                renderer.submit(job)
+        elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "advices": advices,
+        "total_seconds": elapsed,
+        "ms_per_plot": elapsed / advices * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--advices", type=int, default=500)
+    parser.add_argument("--mode", choices=list(MODES))
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.advices)))
+        return
+
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_render", "--mode", mode]
+            + ["--advices", str(args.advices)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output)
+        rss = {
+            process: "n/a" if mb is None else f"{mb:.0f} MB"
+            for process, mb in result["peak_rss_mb"].items()
+        }
+        print(
+            f"{mode:>6}: {result['ms_per_plot']:.1f} ms/plot, "
+            f"peak RSS {rss['self']} (main), {rss['children']} (workers)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Synthetic Google Flights results for the benchmarks.
+
+    python -m benchmarks.fixtures
+
+writes benchmarks/data/flights_<size>.json. The output only depends on the seed, so
+the committed files can be regenerated byte for byte.
+"""
+
+import datetime
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy as np
+import pandas
+import pendulum
+from fast_flights import Flight
+
+import src.currency
+from src.currency import RateTable
+
+DATA_DIR = Path(__file__).parent / "data"
+SIZES = [10, 100, 1000, 10000]
+SEARCH_DATE = pendulum.date(2030, 7, 13)
+AIRLINES = ["KLM", "Delta", "Lufthansa", "Air France", "United", "Icelandair"]
+AIRPORTS = ["AMS", "JFK", "LHR", "BKK", "NBO", "LAX", "GRU", "SYD"]
+CURRENCIES = ["EUR", "USD", "JPY", "GBP", "THB"]
+RATES = RateTable(
+    rates={
+        "USD": {datetime.date(2025, 7, 11): 1.1684},
+        "JPY": {datetime.date(2025, 7, 11): 172.21},
+        "GBP": {datetime.date(2025, 7, 11): 0.8667},
+        "THB": {datetime.date(2025, 7, 11): 38.012},
+    },
+    last_date=datetime.date(2025, 7, 11),
+)
+
+
+def use_fixed_rates() -> None:
+    """
+    Converts prices with `RATES` instead of the ECB history, so the benchmarks do
+    not download it and do not depend on the day they run.
+    """
+    src.currency._converter = RATES
+
+
+def format_time(dt: pendulum.DateTime) -> str:
+    return dt.format("h:mm A [on] ddd, MMM D")
+
+
+def make_flights(size: int, seed: int = 0) -> list[Flight]:
+    """
+    Flights from AMS to JFK departing on `SEARCH_DATE`.
+    """
+    rng = np.random.default_rng(seed)
+    start = pendulum.datetime(
+        SEARCH_DATE.year, SEARCH_DATE.month, SEARCH_DATE.day, tz="Europe/Amsterdam"
+    )
+    flights = []
+    for i in range(size):
+        departure = start.add(minutes=int(rng.integers(0, 24 * 12)) * 5)
+        duration = int(rng.integers(7 * 12, 20 * 12)) * 5
+        arrival = departure.add(minutes=duration).in_timezone("America/New_York")
+        ahead = (arrival.date() - departure.date()).days
+        stops = int(rng.integers(0, 3))
+        price = float(rng.normal(800 + 150 * stops, 250))
+        flights.append(
+            Flight(
+                is_best=i < 3,
+                name=str(rng.choice(AIRLINES)),
+                departure=format_time(departure),
+                # the arrival date is shown as the departure date plus "+1"
+                arrival=format_time(arrival.subtract(days=ahead)),
+                arrival_time_ahead=f"+{ahead}" if ahead else "",
+                duration=f"{duration // 60} hr {duration % 60} min",
+                stops=stops,
+                delay=None,
+                price=f"€{max(price, 50):,.0f}",
+            )
+        )
+    return flights
+
+
+def load_flights(size: int) -> list[Flight]:
+    with open(DATA_DIR / f"flights_{size}.json") as f:
+        return [Flight(**flight) for flight in json.load(f)]
+
+
+def make_sheet(size: int, seed: int = 0) -> pandas.DataFrame:
+    rng = np.random.default_rng(seed)
+    today = pendulum.today()
+    departures = [
+        pandas.Timestamp(today.add(days=int(days)).date())
+        for days in rng.integers(10, 200, size)
+    ]
+    return pandas.DataFrame(
+        {
+            "Name": [f"employee {i}" for i in range(size)],
+            "Departure_Airport_Code": rng.choice(AIRPORTS, size),
+            "Departure_Date": departures,
+            "Arrival_Airport_Code": rng.choice(AIRPORTS, size),
+            "Return_Date": [
+                d + pandas.Timedelta(days=int(days)) if days < 30 else pandas.NaT
+                for d, days in zip(departures, rng.integers(5, 40, size))
+            ],
+            "Amount_Of_Passengers": rng.integers(1, 6, size),
+            "Home_Currency": rng.choice(CURRENCIES, size),
+        }
+    )
+
+
+def main():
+    DATA_DIR.mkdir(exist_ok=True)
+    for size in SIZES:
+        path = DATA_DIR / f"flights_{size}.json"
+        with open(path, "w") as f:
+            json.dump([asdict(flight) for flight in make_flights(size)], f)
+            f.write("\n")
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Micro-benchmarks of the parsing and analysis hot paths.
+
+    python -m benchmarks.run                       # writes benchmarks/results/<version>.json
+    python -m benchmarks.run --compare benchmarks/results/0.1.2.json
+
+Every benchmark is run on the committed fixtures of 10, 100, 1k and 10k flights and
+reports the best time of a few repeats. With --compare, the run fails when a
+benchmark got slower than --threshold times the earlier result.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tomllib
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+import src.flights
+from benchmarks.fixtures import (
+    SEARCH_DATE,
+    SIZES,
+    load_flights,
+    make_sheet,
+    use_fixed_rates,
+)
+from src.analysis import biased_prices, get_advice, iqr_filter, pareto_mask
+from src.flights import (
+    Currency,
+    FlightBatch,
+    FlightRequest,
+    configure_history,
+    deformat_price,
+    get_parsed_flights,
+    parse_flight,
+    parse_flight_time,
+)
+from src.history import PriceHistory
+from src.input import parse_df
+
+HISTORY_DAYS = 30
+
+ROOT = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / "results"
+
+request = FlightRequest(
+    departure_airport="AMS",
+    arrival_airport="JFK",
+    family_size=1,
+    host_currency=Currency("US Dollar", "$", "USD"),
+    departure_date=SEARCH_DATE,
+    return_date=None,
+)
+
+
+def best_time(function: Callable[[], object], repeat: int = 5) -> float:
+    function()  # warm up caches, e.g. timezones and exchange rates
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def fill_history(path: str, batch: FlightBatch) -> PriceHistory:
+    """
+    A price history with the batch searched for every day of a month.
+    """
+    history = PriceHistory(path)
+    for day in range(HISTORY_DAYS):
+        key = ("AMS", "JFK", SEARCH_DATE.add(days=day), None, 1)
+        history.add(key, batch, "typical", 8)
+    return history
+
+
+def benchmarks(size: int, directory: str) -> dict[str, Callable[[], object]]:
+    flights = load_flights(size)
+    batch, _, _ = get_parsed_flights_offline(flights)
+    prices, minutes = biased_prices(batch)
+    sheet = make_sheet(size)
+    history = fill_history(os.path.join(directory, f"history-{size}.sqlite3"), batch)
+    history_key = ("AMS", "JFK", SEARCH_DATE, None, 1)
+    scratch = PriceHistory(os.path.join(directory, f"scratch-{size}.sqlite3"))
+    return {
+        "parse_flight": lambda: [
+            parse_flight(flight, "AMS", "JFK", SEARCH_DATE) for flight in flights
+        ],
+        "parse_flight_time": lambda: [
+            parse_flight_time(flight.departure, "Europe/Amsterdam", SEARCH_DATE)
+            for flight in flights
+        ],
+        "deformat_price": lambda: [deformat_price(flight.price) for flight in flights],
+        "get_parsed_flights": lambda: get_parsed_flights_offline(flights),
+        "biased_prices": lambda: biased_prices(batch),
+        "iqr_filter": lambda: iqr_filter(batch.price),
+        "pareto_mask": lambda: pareto_mask(prices, minutes),
+        "get_advice": lambda: get_advice(
+            batch, "plot.png", "benchmark", request, "typical", 8, charts="typst"
+        ),
+        "parse_df": lambda: parse_df(sheet),
+        "history_add": lambda: scratch.add(history_key, batch, "typical", 8),
+        "history_median": lambda: history.median_price(
+            "AMS", "JFK", SEARCH_DATE, SEARCH_DATE.add(days=HISTORY_DAYS), days=90
+        ),
+    }
+
+
+def get_parsed_flights_offline(flights):
+    original = src.flights.get_raw_flights
+    src.flights.get_raw_flights = lambda _: (flights, "typical", 8, None)
+    try:
+        return get_parsed_flights(request)
+    finally:
+        src.flights.get_raw_flights = original
+
+
+def run(sizes: list[int], repeat: int) -> dict:
+    results: dict[str, dict[str, float]] = {}
+    # the parse benchmarks should not write to the real price history
+    configure_history(max_age_hours=0, record=False)
+    use_fixed_rates()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            for name, function in benchmarks(size, directory).items():
+                seconds = best_time(function, repeat)
+                results.setdefault(name, {})[str(size)] = seconds
+                print(f"{name:>20} {size:>6}: {seconds * 1000:10.3f} ms")
+    with open(ROOT / "pyproject.toml", "rb") as f:
+        version = tomllib.load(f)["project"]["version"]
+    return {
+        "version": version,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, sizes in current["results"].items():
+        for size, seconds in sizes.items():
+            before = baseline["results"].get(name, {}).get(size)
+            if before and seconds > before * threshold:
+                regressions.append(
+                    f"{name} ({size}): {before * 1000:.3f} ms -> {seconds * 1000:.3f} ms"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path)
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args()
+
+    # read the baseline first, the run may write to the same file
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    current = run(args.sizes, args.repeat)
+    output = args.output or RESULTS_DIR / f"{current['version']}.json"
+    if args.compare and output.resolve() == args.compare.resolve():
+        output = output.with_name(f"{output.stem}.new.json")
+        print(f"Not overwriting the compared results, writing to {output} instead.")
+    output.parent.mkdir(exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(current, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {output}")
+
+    if baseline is not None:
+        regressions = compare(current, baseline, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
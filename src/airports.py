@@ -0,0 +1,245 @@
+import csv
+import io
+import os
+import pickle
+import pkgutil
+import threading
+from dataclasses import dataclass
+from itertools import product
+
+import numpy as np
+
+CSV_RESOURCE = "resources/airports.csv"
+SNAPSHOT_RESOURCE = "resources/airports.pickle"
+SNAPSHOT_VERSION = 1
+TEXT_COLUMNS = ("iata", "name", "city", "country", "tz")
+EARTH_RADIUS_KM = 6371.0
+GRID_CELL_KM = 100.0
+
+
+@dataclass(frozen=True, slots=True)
+class AirportRecord:
+    iata: str
+    name: str
+    city: str
+    country: str
+    lat: float
+    lon: float
+    tz: str
+
+
+def read_airports_csv() -> dict[str, np.ndarray | list[str]]:
+    """
+    Parses airports.csv into parallel columns, keeping only airports with an IATA code.
+    """
+    # Load CSV from within the PyInstaller bundle (works with --onefile)
+    data = pkgutil.get_data(__name__, CSV_RESOURCE)
+    if data is None:
+        raise RuntimeError("Could not load airports.csv")
+    rows = {}
+    with io.StringIO(data.decode("utf-8")) as f:
+        for row in csv.DictReader(f):
+            code = row["iata"].upper()
+            if code:
+                rows[code] = row
+    columns: dict[str, np.ndarray | list[str]] = {
+        column: [row[column] for row in rows.values()] for column in TEXT_COLUMNS
+    }
+    columns["iata"] = list(rows)
+    columns["lat"] = np.array([float(row["lat"]) for row in rows.values()])
+    columns["lon"] = np.array([float(row["lon"]) for row in rows.values()])
+    return columns
+
+
+def write_snapshot(path: str | None = None) -> str:
+    """
+    Writes the parsed airports next to airports.csv, so they load without parsing the CSV.
+    Run `python -m src.airports` after updating airports.csv.
+    """
+    path = path or os.path.join(os.path.dirname(__file__), SNAPSHOT_RESOURCE)
+    with open(path, "wb") as f:
+        pickle.dump(
+            {"version": SNAPSHOT_VERSION, "columns": read_airports_csv()},
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    return path
+
+
+def read_snapshot() -> dict[str, np.ndarray | list[str]] | None:
+    try:
+        data = pkgutil.get_data(__name__, SNAPSHOT_RESOURCE)
+    except OSError:
+        return None
+    if data is None:
+        return None
+    snapshot = pickle.loads(data)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot["columns"]
+
+
+def unit_vectors(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack(
+        (np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat))
+    )
+
+
+def chord_length(distance_km: float) -> float:
+    """
+    The straight-line distance on the unit sphere between two points `distance_km`
+    apart on the surface of the earth.
+    """
+    angle = min(distance_km / EARTH_RADIUS_KM, np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+class SpatialGrid:
+    """
+    Buckets points on the unit sphere into cubes of `cell_km`, so the points within a
+    radius are found by checking only the cubes around the centre.
+    """
+
+    def __init__(self, points: np.ndarray, cell_km: float = GRID_CELL_KM):
+        self.points = points
+        self.cell = chord_length(cell_km)
+        cells = np.floor(points / self.cell).astype(np.int64)
+        order = np.lexsort(cells.T[::-1])
+        keys, starts = np.unique(cells[order], axis=0, return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self.buckets = {
+            tuple(key): order[start:end]
+            for key, start, end in zip(keys.tolist(), starts, ends)
+        }
+
+    def within(
+        self, point: np.ndarray, radius_km: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The positions of the points within `radius_km` of `point`, with their distances
+        in km, nearest first.
+        """
+        chord = chord_length(radius_km)
+        low = np.floor((point - chord) / self.cell).astype(np.int64)
+        high = np.floor((point + chord) / self.cell).astype(np.int64)
+        ranges = [range(lo, hi + 1) for lo, hi in zip(low.tolist(), high.tolist())]
+        found = [self.buckets[key] for key in product(*ranges) if key in self.buckets]
+        if not found:
+            return np.zeros(0, np.int64), np.zeros(0)
+        candidates = np.concatenate(found)
+        chords = np.linalg.norm(self.points[candidates] - point, axis=1)
+        inside = chords <= chord
+        candidates, chords = candidates[inside], chords[inside]
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chords / 2, 1))
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+
+class AirportIndex:
+    """
+    Airports with an IATA code, loaded on the first lookup.
+    The columns come from the prebuilt snapshot, or from airports.csv if it is missing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns: dict[str, np.ndarray | list[str]] | None = None
+        self._positions: dict[str, int] | None = None
+        self._grid: SpatialGrid | None = None
+
+    def _load(self) -> dict[str, int]:
+        if self._positions is None:
+            with self._lock:
+                if self._positions is None:
+                    columns = read_snapshot() or read_airports_csv()
+                    self._columns = columns
+                    self._positions = {
+                        code: i for i, code in enumerate(columns["iata"])
+                    }
+        return self._positions
+
+    @property
+    def columns(self) -> dict[str, np.ndarray | list[str]]:
+        self._load()
+        return self._columns  # type: ignore
+
+    def __contains__(self, code: str) -> bool:
+        return code.upper() in self._load()
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def record(self, i: int) -> AirportRecord:
+        columns = self.columns
+        return AirportRecord(
+            iata=columns["iata"][i],  # type: ignore
+            name=columns["name"][i],  # type: ignore
+            city=columns["city"][i],  # type: ignore
+            country=columns["country"][i],  # type: ignore
+            lat=float(columns["lat"][i]),
+            lon=float(columns["lon"][i]),
+            tz=columns["tz"][i],  # type: ignore
+        )
+
+    def get(self, code: str) -> AirportRecord | None:
+        i = self._load().get(code.upper())
+        if i is None:
+            return None
+        return self.record(i)
+
+    @property
+    def grid(self) -> SpatialGrid:
+        if self._grid is None:
+            columns = self.columns
+            grid = SpatialGrid(unit_vectors(columns["lat"], columns["lon"]))  # type: ignore
+            with self._lock:
+                self._grid = self._grid or grid
+        return self._grid
+
+    def nearby(self, code: str, radius_km: float) -> list[tuple[AirportRecord, float]]:
+        """
+        The other airports within `radius_km` of the airport, with their distance in
+        km, nearest first.
+        """
+        i = self._load().get(code.upper())
+        if i is None:
+            raise ValueError(f"Unknown airport code: {code.upper()}")
+        positions, distances = self.grid.within(self.grid.points[i], radius_km)
+        return [
+            (self.record(j), float(distance))
+            for j, distance in zip(positions.tolist(), distances.tolist())
+            if j != i
+        ]
+
+    def search(self, query: str) -> list[AirportRecord]:
+        """
+        Finds airports by IATA code, city or name. Exact codes come first, then
+        airports in a city of that name, then airports whose name or city contains
+        the query. International airports go first within each group.
+        """
+        query = query.strip().lower()
+        columns = self.columns
+        matches = []
+        code = self._load().get(query.upper())
+        if code is not None:
+            matches.append((0, code))
+        for i, (name, city) in enumerate(zip(columns["name"], columns["city"])):
+            if i == code:
+                continue
+            name, city = name.lower(), city.lower()
+            if city == query:
+                rank = 1
+            elif query in name or query in city:
+                rank = 2
+            else:
+                continue
+            matches.append((rank * 2 + ("international" not in name), i))
+        return [self.record(i) for _, i in sorted(matches)]
+
+
+airports = AirportIndex()
+
+
+if __name__ == "__main__":
+    print(f"Wrote {write_snapshot()}")
@@ -1,13 +1,20 @@
 from dataclasses import dataclass
+from typing import Literal
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pendulum
 
-from src.flights import FlightRequest, ParsedFlight, load_currency_converter
+from src.currency import get_converter
+from src.flights import (
+    FlightBatch,
+    FlightRequest,
+    ParsedFlight,
+)
+from src.instrumentation import count
+from src.render import PlotJob, Renderer, render_plot
 from src.util import get_template_dir
 
-converter = load_currency_converter()
+ChartMode = Literal["png", "typst"]
 
 
 @dataclass(frozen=True, order=True)
@@ -18,20 +25,51 @@ class ParetoFlight:
     converted: str
 
 
+@dataclass
+class PlotData:
+    """
+    The points of the Pareto plot, drawn by the Typst report itself.
+    """
+
+    minutes: list[int]
+    prices: list[float]
+    pareto_minutes: list[int]
+    pareto_prices: list[float]
+
+
+@dataclass
+class DateMatrix:
+    """
+    The cheapest rounded price in euros for every pair of departure date (rows) and
+    return date (columns). One-way trips have a single column without a date.
+    Pairs without flights are None.
+    """
+
+    departure_dates: list[str]
+    return_dates: list[str | None]
+    prices: list[list[int | None]]
+
+
 @dataclass
 class Advice:
     """
     The price is in euros. The duration is in minutes.
+    Either `pareto_path` points to a rendered plot, or `plot` holds the points to draw.
+    `routes` lists the routes whose flights were merged, if nearby airports were
+    searched too.
     """
 
     pareto_flights: list[ParetoFlight]
-    pareto_path: str
+    pareto_path: str | None
     name: str
     request: FlightRequest
     departure_date_str: str
     return_date_str: str | None
     buying_time: str
     avg_duration: float
+    plot: PlotData | None = None
+    date_matrix: DateMatrix | None = None
+    routes: list[str] | None = None
 
 
 def is_dominated(i: int, prices: np.ndarray, durations: np.ndarray) -> bool:
@@ -43,42 +81,80 @@ def is_dominated(i: int, prices: np.ndarray, durations: np.ndarray) -> bool:
     return False
 
 
-def plot_flights(
-    minutes: np.ndarray,
-    prices: np.ndarray,
-    sorted_pareto_minutes: np.ndarray,
-    sorted_pareto_prices: np.ndarray,
-    file: str,
-    title: str,
-) -> None:
-    plt.figure(figsize=(10, 6))
-    plt.scatter(minutes, prices, c="lightgray", label="All flights")
-    plt.scatter(
-        sorted_pareto_minutes, sorted_pareto_prices, c="red", label="Best flights"
-    )
-    plt.plot(sorted_pareto_minutes, sorted_pareto_prices, "r--", alpha=0.5)
+def pareto_mask(prices: np.ndarray, durations: np.ndarray) -> np.ndarray:
+    """
+    Returns a mask of the flights that are not dominated by any other flight, in
+    O(n log n). Equal flights do not dominate each other, like in `is_dominated`.
+    """
+    n = len(prices)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    order = np.lexsort((prices, durations))
+    sorted_prices = prices[order]
+    sorted_durations = durations[order]
 
-    plt.xlabel("Duration (minutes)")
-    plt.ylabel("Price (€)")
-    plt.title(title)
-    plt.legend()
-    plt.grid(True)
-    plt.savefig(get_template_dir() + "/" + file)
+    # group flights with the same duration, cheapest first
+    is_group_start = np.empty(n, dtype=bool)
+    is_group_start[0] = True
+    is_group_start[1:] = sorted_durations[1:] != sorted_durations[:-1]
+    group_starts = np.flatnonzero(is_group_start)
+    group_ids = np.cumsum(is_group_start) - 1
+    group_min = sorted_prices[group_starts]
+
+    # cheapest price among all strictly shorter flights
+    running_min = np.minimum.accumulate(sorted_prices)
+    shorter_min = np.empty(len(group_starts))
+    shorter_min[0] = np.inf
+    shorter_min[1:] = running_min[group_starts[1:] - 1]
+
+    keep_sorted = (sorted_prices == group_min[group_ids]) & (shorter_min > group_min)[
+        group_ids
+    ]
+    mask = np.empty(n, dtype=bool)
+    mask[order] = keep_sorted
+    return mask
+
+
+def pareto_mask_nd(points: np.ndarray) -> np.ndarray:
+    """
+    Returns a mask of the rows of `points` (n flights by k objectives, lower is
+    better) that are not dominated by any other row, e.g. price, duration and stops.
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    order = np.lexsort(points.T[::-1])
+    candidates = points[order]
+    keep = np.ones(n, dtype=bool)
+    for i in range(n):
+        if not keep[i]:
+            continue
+        # a row can only be dominated by rows that come before it in lexicographic order
+        later = candidates[i + 1 :]
+        dominated = np.all(candidates[i] <= later, axis=1) & np.any(
+            candidates[i] < later, axis=1
+        )
+        keep[i + 1 :] &= ~dominated
+    mask = np.empty(n, dtype=bool)
+    mask[order] = keep
+    return mask
 
 
 def get_advice(
-    flights: list[ParsedFlight],
+    flights: FlightBatch | list[ParsedFlight],
     filename: str,
     name: str,
     request: FlightRequest,
     buying_time: str,
     avg_duration: float,
+    renderer: Renderer | None = None,
+    charts: ChartMode = "png",
 ) -> Advice:
     prices, minutes = biased_prices(flights)
     title = f"{request.departure_airport}-{request.arrival_airport}: Price vs Duration"
 
-    N = len(prices)
-    pareto_indices = [i for i in range(N) if not is_dominated(i, prices, minutes)]
+    pareto_indices = np.flatnonzero(pareto_mask(prices, minutes))
 
     pareto_minutes = minutes[pareto_indices]
     pareto_prices = prices[pareto_indices]
@@ -87,36 +163,62 @@ def get_advice(
     sorted_pareto_minutes = pareto_minutes[sorted_indices]
     sorted_pareto_prices = pareto_prices[sorted_indices]
 
-    plot_flights(
-        minutes, prices, sorted_pareto_minutes, sorted_pareto_prices, filename, title
-    )
+    pareto_path = None
+    plot = None
+    if charts == "typst":
+        plot = PlotData(
+            minutes.tolist(),
+            prices.tolist(),
+            sorted_pareto_minutes.tolist(),
+            sorted_pareto_prices.tolist(),
+        )
+    else:
+        pareto_path = filename
+        plot_job = PlotJob(
+            minutes,
+            prices,
+            sorted_pareto_minutes,
+            sorted_pareto_prices,
+            get_template_dir() + "/" + filename,
+            title,
+        )
+        if renderer is None:
+            render_plot(plot_job)
+        else:
+            renderer.submit(plot_job)
+
     departure_date_str = request.departure_date.to_formatted_date_string()
     return_date_str = None
     if request.return_date:
         return_date_str = request.return_date.to_formatted_date_string()
 
+    rounded_prices = round_prices_with_margins(pareto_prices)
+    converted_prices = get_converter().convert_array(
+        rounded_prices, "EUR", request.host_currency.abbreviation
+    )
     pareto_flights = set()
-    for i in range(len(pareto_indices)):
-        rounded = round_with_margins(pareto_prices[i])
-        duration = pendulum.duration(minutes=int(pareto_minutes[i]))
-        converted = converter.convert(
-            rounded, "EUR", request.host_currency.abbreviation
-        )
-        converted_str = "{:.2f}".format(converted)
+    for price, rounded, converted, flight_minutes in zip(
+        pareto_prices.tolist(),
+        rounded_prices.tolist(),
+        converted_prices.tolist(),
+        pareto_minutes.tolist(),
+    ):
+        duration = pendulum.duration(minutes=int(flight_minutes))
         pareto_flight = ParetoFlight(
-            pareto_prices[i], rounded, duration.in_words(), converted_str
+            price, rounded, duration.in_words(), "{:.2f}".format(converted)
         )
         pareto_flights.add(pareto_flight)
 
     return Advice(
         pareto_flights=sorted(list(pareto_flights)),
-        pareto_path=filename,
+        pareto_path=pareto_path,
         name=name.title(),
         request=request,
         departure_date_str=departure_date_str,
         return_date_str=return_date_str,
         buying_time=buying_time,
         avg_duration=avg_duration,
+        plot=plot,
     )
 
 
@@ -125,37 +227,42 @@ def iqr_filter(prices: np.ndarray, multiplier=1.5) -> np.ndarray:
     q3 = np.percentile(prices, 75)
     iqr = q3 - q1
 
-    filtered = [q1 - multiplier * iqr <= p <= q3 + multiplier * iqr for p in prices]
-    return np.array(filtered)
+    return (q1 - multiplier * iqr <= prices) & (prices <= q3 + multiplier * iqr)
 
 
 def biased_prices(
-    flights: list[ParsedFlight],
+    flights: FlightBatch | list[ParsedFlight],
 ) -> tuple[np.ndarray, np.ndarray]:
-    repeats = np.zeros(len(flights), dtype=int)
-    # remove flights with outlying durations
-    durations = np.array(
-        list(
-            map(
-                lambda flight: flight.arrival.diff(flight.departure).in_minutes(),
-                flights,
-            )
-        )
-    )
-    old_prices = np.array(list(map(lambda flight: flight.price, flights)))
+    if not isinstance(flights, FlightBatch):
+        flights = FlightBatch.from_parsed(flights)
+    mask = typical_mask(flights)
+    count("flights_discarded_iqr", len(mask) - int(np.count_nonzero(mask)))
+    return flights.price[mask], flights.minutes[mask]
 
-    has_normal_duration_mask = iqr_filter(durations)
-    has_normal_price_mask = iqr_filter(old_prices)
-    mask = has_normal_duration_mask * has_normal_price_mask
 
-    repeats[mask] = 1
+def typical_mask(flights: FlightBatch) -> np.ndarray:
+    """
+    Selects the flights without outlying durations or prices.
+    """
+    return iqr_filter(flights.minutes) & iqr_filter(flights.price)
 
-    prices = np.repeat(old_prices, repeats)
-    new_durations = np.repeat(durations, repeats)
-    return prices, new_durations
+
+def cheapest_per_cell(
+    prices: np.ndarray, cells: np.ndarray, shape: tuple[int, int]
+) -> np.ndarray:
+    """
+    The lowest price of the flights in every cell of a grid of the given shape,
+    where `cells` holds the flat cell index of every flight. Empty cells are NaN.
+    """
+    cheapest = np.full(shape[0] * shape[1], np.inf)
+    np.minimum.at(cheapest, cells, prices)
+    cheapest[np.isinf(cheapest)] = np.nan
+    return cheapest.reshape(shape)
 
 
 def round_with_margins(price: float) -> int:
-    price_with_margins = price * 1.1
-    rounded = int(np.ceil(price_with_margins / 25) * 25)
-    return rounded
+    return int(round_prices_with_margins(np.asarray(price)))
+
+
+def round_prices_with_margins(prices: np.ndarray) -> np.ndarray:
+    return (np.ceil(prices * 1.1 / 25) * 25).astype(np.int64)
@@ -0,0 +1,139 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from pendulum import Date
+
+from src.flights import FlightBatch, FlightRequest, get_parsed_flights
+
+DEFAULT_WORKERS = 4
+
+FetchResult = tuple[FlightBatch, str, float]
+SearchKey = tuple[str, str, int, Date, Date | None]
+Expansion = TypeVar("Expansion")
+
+
+def request_key(request: FlightRequest) -> SearchKey:
+    """
+    Two requests with the same key result in identical flight searches.
+    """
+    return (
+        request.departure_airport.upper(),
+        request.arrival_airport.upper(),
+        request.family_size,
+        request.departure_date,
+        request.return_date,
+    )
+
+
+@dataclass
+class SearchPlan:
+    rows: list[tuple[int, str, FlightRequest, SearchKey]] = field(default_factory=list)
+    searches: dict[SearchKey, tuple[str, FlightRequest]] = field(default_factory=dict)
+
+    @property
+    def saved_searches(self) -> int:
+        return len(self.rows) - len(self.searches)
+
+    def add(self, i: int, name: str, request: FlightRequest) -> SearchKey | None:
+        """
+        Adds a row to the plan. Returns its key if it needs a new search.
+        """
+        key = request_key(request)
+        self.rows.append((i, name, request, key))
+        if key in self.searches:
+            return None
+        self.searches[key] = (name, request)
+        return key
+
+
+def plan_searches(requests: Iterable[tuple[str, FlightRequest | None]]) -> SearchPlan:
+    plan = SearchPlan()
+    for i, (name, request) in enumerate(requests):
+        if request is not None:
+            plan.add(i, name, request)
+    return plan
+
+
+def fetch_row(name: str, request: FlightRequest) -> FetchResult | None:
+    try:
+        return get_parsed_flights(request)
+    except Exception as e:
+        print(f"Could not fetch flights for {name}: {e!r}. Skipping...")
+        return None
+
+
+def fetch_requests(
+    requests: Iterable[tuple[str, FlightRequest | None]],
+    max_workers: int = DEFAULT_WORKERS,
+    lookup: Callable[[str, FlightRequest], FetchResult | None] | None = None,
+) -> Iterator[tuple[int, str, FlightRequest, FetchResult | None]]:
+    """
+    Fetch the flights of all requests with at most `max_workers` lookups in flight.
+    Searches start while `requests` is still being read. Identical searches are only
+    done once, and their result is shared by every row that asked for it. Rows for
+    which `lookup` returns a result are not searched at all. Results are yielded in
+    input order as soon as they are available. A row that fails yields `None`
+    instead of aborting the other rows.
+    """
+    plan = SearchPlan()
+    futures: dict[SearchKey, Future] = {}
+    rows: list[tuple[int, str, FlightRequest, Future]] = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for i, (name, request) in enumerate(requests):
+            if request is None:
+                continue
+            known = lookup(name, request) if lookup else None
+            if known is not None:
+                future: Future = Future()
+                future.set_result(known)
+                rows.append((i, name, request, future))
+                continue
+            key = plan.add(i, name, request)
+            if key is not None:
+                futures[key] = executor.submit(fetch_row, name, request)
+            rows.append((i, name, request, futures[request_key(request)]))
+        if plan.saved_searches:
+            print(
+                f"Combined {len(plan.rows)} requests into {len(plan.searches)} searches, "
+                f"saving {plan.saved_searches} flight lookups."
+            )
+        for i, name, request, future in rows:
+            yield i, name, request, future.result()
+
+
+def fetch_expanded(
+    requests: Iterable[tuple[str, FlightRequest | None]],
+    expand: Callable[[FlightRequest], tuple[Expansion, list[FlightRequest]]],
+    max_workers: int = DEFAULT_WORKERS,
+) -> Iterator[tuple[int, str, FlightRequest, Expansion, list[FetchResult | None]]]:
+    """
+    Fetch the flights of several searches per row. `expand` turns a request into the
+    requests to search, along with whatever describes them. All of them go through
+    `fetch_requests` together, so they are searched concurrently and searches shared
+    between rows are done once. Rows are yielded in input order, with the
+    description and the results of their searches.
+    """
+    rows: list[tuple[int, str, FlightRequest, Expansion]] = []
+    owners: list[int] = []
+
+    def expanded() -> Iterator[tuple[str, FlightRequest]]:
+        for i, (name, request) in enumerate(requests):
+            if request is None:
+                continue
+            expansion, searches = expand(request)
+            if not searches:
+                print(f"Nothing left to search for {name}. Skipping...")
+                continue
+            for search in searches:
+                owners.append(len(rows))
+                yield name, search
+            rows.append((i, name, request, expansion))
+
+    results: list[FetchResult | None] = []
+    for j, _, _, result in fetch_requests(expanded(), max_workers):
+        results.append(result)
+        i, name, request, expansion = rows[owners[j]]
+        if owners[j + 1 : j + 2] != [owners[j]]:
+            yield i, name, request, expansion, results
+            results = []
@@ -0,0 +1,151 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, TypeVar
+
+from src.instrumentation import count
+
+T = TypeVar("T")
+
+DEFAULT_MAX_USES = 50
+
+Launcher = Callable[[], Awaitable[tuple[Any, Callable[[], Awaitable[None]]]]]
+"""Starts a browser and returns it with a coroutine function that stops its driver."""
+
+
+async def launch_chromium() -> tuple[Any, Callable[[], Awaitable[None]]]:
+    from playwright.async_api import async_playwright
+
+    playwright = await async_playwright().start()
+    browser = await playwright.chromium.launch()
+    return browser, playwright.stop
+
+
+class BrowserPool:
+    """
+    Keeps up to `size` browser contexts of one headless browser warm, so flight
+    lookups do not pay for starting a browser every time. Playwright objects belong
+    to the event loop that created them, so the browser lives on its own thread and
+    `run` hands tasks to it from any thread.
+
+    A context is replaced after `max_uses` tasks or when a task fails, and the
+    browser is started again when it crashed. Nothing is started until the first
+    task.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_uses: int = DEFAULT_MAX_USES,
+        launch: Launcher = launch_chromium,
+    ):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self._launch = launch
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._browser: Any = None
+        self._stop_driver: Callable[[], Awaitable[None]] | None = None
+        self._slots: asyncio.Queue | None = None
+        self._browser_lock: asyncio.Lock | None = None
+
+    def __enter__(self) -> "BrowserPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=loop.run_forever, name="browser-pool", daemon=True
+                )
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _setup(self) -> None:
+        self._slots = asyncio.Queue()
+        for _ in range(self.size):
+            # a slot holds a context, created on first use, and how often it was used
+            self._slots.put_nowait([None, 0])
+        self._browser_lock = asyncio.Lock()
+
+    async def _get_browser(self) -> Any:
+        async with self._browser_lock:  # type: ignore
+            if self._browser is None or not self._browser.is_connected():
+                if self._browser is not None:
+                    print("The browser stopped, starting it again.")
+                    await self._stop()
+                self._browser, self._stop_driver = await self._launch()
+                count("browser_launches")
+            return self._browser
+
+    async def _run(self, task: Callable[[Any], Awaitable[T]]) -> T:
+        slot = await self._slots.get()  # type: ignore
+        try:
+            if slot[0] is None:
+                browser = await self._get_browser()
+                slot[0] = await browser.new_context()
+                slot[1] = 0
+                count("browser_contexts")
+            result = await task(slot[0])
+            slot[1] += 1
+            if slot[1] >= self.max_uses:
+                await self._close_context(slot)
+            return result
+        except Exception:
+            await self._close_context(slot)
+            raise
+        finally:
+            self._slots.put_nowait(slot)  # type: ignore
+
+    async def _close_context(self, slot: list) -> None:
+        context, slot[0], slot[1] = slot[0], None, 0
+        if context is not None:
+            try:
+                await context.close()
+            except Exception:
+                # the context is gone with a crashed browser
+                pass
+
+    async def _stop(self) -> None:
+        browser, self._browser = self._browser, None
+        stop_driver, self._stop_driver = self._stop_driver, None
+        try:
+            if browser is not None:
+                await browser.close()
+        except Exception:
+            pass
+        if stop_driver is not None:
+            await stop_driver()
+
+    async def _shutdown(self) -> None:
+        while not self._slots.empty():  # type: ignore
+            await self._close_context(self._slots.get_nowait())  # type: ignore
+        await self._stop()
+
+    def run(self, task: Callable[[Any], Awaitable[T]]) -> T:
+        """
+        Runs `task` with a browser context from the pool and waits for its result.
+        """
+        loop = self._start()
+        return asyncio.run_coroutine_threadsafe(self._run(task), loop).result()
+
+    def close(self) -> None:
+        """
+        Closes all contexts and the browser. Call it when no tasks are running.
+        """
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=30)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join()  # type: ignore
+            loop.close()
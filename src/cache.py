@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import asdict
+from typing import Callable, Literal
+
+from fast_flights import Flight, FlightData, Passengers, Result
+
+from src.util import get_cache_path
+
+CacheMode = Literal["use", "bypass", "refresh"]
+
+DEFAULT_TTL_HOURS = 6.0
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def search_key(
+    flight_data: list[FlightData],
+    trip: str,
+    seat: str,
+    passengers: Passengers,
+    max_stops: int | None = None,
+) -> str:
+    parts = [repr(fd) for fd in flight_data]
+    parts += [trip, seat, repr(passengers), repr(max_stops)]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def dump_result(result: Result) -> dict:
+    return {
+        "current_price": result.current_price,
+        "flights": [asdict(flight) for flight in result.flights],
+    }
+
+
+def load_result(data: dict) -> Result:
+    return Result(
+        current_price=data["current_price"],
+        flights=[Flight(**flight) for flight in data["flights"]],
+    )
+
+
+class SearchCache:
+    """
+    Stores Google Flights search results in a SQLite file in the cache directory.
+    Entries expire after `ttl_hours`, and the least recently used entries are
+    evicted once more than `max_entries` are stored.
+    In "bypass" mode the cache is neither read nor written, in "refresh" mode it
+    is only written.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        ttl_hours: float = DEFAULT_TTL_HOURS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        mode: CacheMode = "use",
+    ):
+        self.path = path or os.path.join(get_cache_path(), "flights.sqlite3")
+        self.ttl_hours = ttl_hours
+        self.max_entries = max_entries
+        self.mode: CacheMode = mode
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            with self._lock:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS searches ("
+                    "key TEXT PRIMARY KEY, result TEXT NOT NULL, "
+                    "created REAL NOT NULL, accessed REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS searches_accessed ON searches (accessed)"
+                )
+                conn.commit()
+                self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Result | None:
+        if self.mode != "use":
+            return None
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT result, created FROM searches WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            result, created = row
+            if now - created > self.ttl_hours * 3600:
+                conn.execute("DELETE FROM searches WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE searches SET accessed = ? WHERE key = ?", (now, key))
+        return load_result(json.loads(result))
+
+    def put(self, key: str, result: Result) -> None:
+        if self.mode == "bypass":
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        now = time.time()
+        data = json.dumps(dump_result(result))
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?)",
+                (key, data, now, now),
+            )
+            conn.execute(
+                "DELETE FROM searches WHERE key IN ("
+                "SELECT key FROM searches ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM searches")
+
+
+class RouteDurationIndex:
+    """
+    Remembers the duration in hours of the direct flight of every route, so the
+    duration probe is done once per (origin, destination) pair. Concurrent lookups
+    of the same route wait for the first one instead of probing again. The index
+    is persisted as JSON in the cache directory, so it is shared between runs.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or os.path.join(get_cache_path(), "route_durations.json")
+        self._lock = threading.Lock()
+        self._route_locks: dict[str, threading.Lock] = {}
+        self._durations: dict[str, int] | None = None
+
+    def _load(self) -> dict[str, int]:
+        if self._durations is None:
+            try:
+                with open(self.path) as f:
+                    self._durations = json.load(f)
+            except (OSError, ValueError):
+                self._durations = {}
+        return self._durations  # type: ignore
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._durations, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, origin: str, destination: str) -> int | None:
+        with self._lock:
+            return self._load().get(f"{origin.upper()}-{destination.upper()}")
+
+    def get_or_compute(
+        self, origin: str, destination: str, compute: Callable[[], int | None]
+    ) -> int | None:
+        """
+        The duration of the route, computed if it is not known yet. When `compute`
+        returns None, nothing is remembered, so the route is computed again later.
+        """
+        route = f"{origin.upper()}-{destination.upper()}"
+        with self._lock:
+            route_lock = self._route_locks.setdefault(route, threading.Lock())
+        with route_lock:
+            with self._lock:
+                duration = self._load().get(route)
+            if duration is not None:
+                return duration
+            duration = compute()
+            if duration is None:
+                return None
+            with self._lock:
+                self._load()[route] = duration
+                self._save()
+            return duration
@@ -0,0 +1,249 @@
+import datetime
+import json
+import os
+import shutil
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+
+import certifi
+import numpy as np
+from currency_converter import CurrencyConverter, RateNotFoundError
+
+from src.util import get_cache_path
+
+ECB_URL = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist.zip"
+DEFAULT_MAX_AGE_HOURS = 24.0
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DAYS = 31
+
+
+def secure_urlopen(url: str, headers: dict[str, str] | None = None):
+    context = ssl.create_default_context(cafile=certifi.where())
+    request = urllib.request.Request(url, headers=headers or {})
+    return urllib.request.urlopen(request, context=context, timeout=60)
+
+
+def refresh_file(url: str, path: str, max_age_hours: float) -> bool:
+    """
+    Downloads `url` to `path` when the local copy is missing or older than
+    `max_age_hours`. The download is conditional on the ETag and Last-Modified of
+    the previous download, and replaces the file atomically.
+    Returns whether the file was replaced.
+    """
+    meta_path = f"{path}.json"
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    exists = os.path.exists(path)
+    checked = meta.get("checked", os.path.getmtime(path) if exists else 0)
+    if exists and time.time() - checked < max_age_hours * 3600:
+        return False
+
+    headers = {}
+    if exists and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if exists and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    replaced = False
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with secure_urlopen(url, headers) as response:
+            with open(tmp_path, "wb") as out_file:
+                shutil.copyfileobj(response, out_file)
+            os.replace(tmp_path, path)
+            replaced = True
+            meta = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            if not exists:
+                raise
+            print(f"Could not refresh {url}: {e}. Using the cached copy.")
+    except OSError as e:
+        if not exists:
+            raise
+        print(f"Could not refresh {url}: {e}. Using the cached copy.")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    meta["checked"] = time.time()
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return replaced
+
+
+def get_currency_file(
+    url: str = ECB_URL, max_age_hours: float = DEFAULT_MAX_AGE_HOURS
+) -> str:
+    os.makedirs(get_cache_path(), exist_ok=True)
+    currency_path = os.path.join(get_cache_path(), "eurofxref-hist.zip")
+
+    if not os.path.exists(currency_path):
+        print("Downloading currency data...")
+    refresh_file(url, currency_path, max_age_hours)
+
+    return currency_path
+
+
+@dataclass
+class RateTable:
+    """
+    The exchange rates of the last `SNAPSHOT_DAYS` days of the ECB history, against EUR.
+    Converts like `CurrencyConverter`, but a missing rate on a date falls back to the
+    last known rate before it. Every (currency, date) is resolved once per run.
+    """
+
+    rates: dict[str, dict[datetime.date, float]]
+    last_date: datetime.date
+    ref_currency: str = "EUR"
+    _resolved: dict[tuple[str, datetime.date], float] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    @property
+    def currencies(self) -> set[str]:
+        return set(self.rates) | {self.ref_currency}
+
+    @classmethod
+    def from_converter(
+        cls, converter: CurrencyConverter, days: int = SNAPSHOT_DAYS
+    ) -> "RateTable":
+        last_date = converter.bounds[converter.ref_currency].last_date  # type: ignore
+        first_date = last_date - datetime.timedelta(days=days)
+        rates = {}
+        for currency, currency_rates in converter._rates.items():  # type: ignore
+            recent = {
+                date: rate
+                for date, rate in currency_rates.items()
+                if date >= first_date and rate is not None
+            }
+            if not recent:
+                # keep the last known rate of currencies that are no longer published
+                last_known = max(
+                    date for date, rate in currency_rates.items() if rate is not None
+                )
+                recent = {last_known: currency_rates[last_known]}
+            rates[currency] = recent
+        return cls(rates, last_date, converter.ref_currency)
+
+    def rate(self, currency: str, date: datetime.date | None = None) -> float:
+        if currency == self.ref_currency:
+            return 1.0
+        date = date or self.last_date
+        resolved = self._resolved.get((currency, date))
+        if resolved is not None:
+            return resolved
+        if currency not in self.rates:
+            raise ValueError(f"{currency} is not a supported currency")
+        currency_rates = self.rates[currency]
+        if date in currency_rates:
+            resolved = currency_rates[date]
+        else:
+            earlier = [d for d in currency_rates if d <= date]
+            if not earlier:
+                raise RateNotFoundError(f"{currency} has no rate for {date}")
+            resolved = currency_rates[max(earlier)]
+        self._resolved[(currency, date)] = resolved
+        return resolved
+
+    def convert(
+        self,
+        amount: float,
+        currency: str,
+        new_currency: str = "EUR",
+        date: datetime.date | None = None,
+    ) -> float:
+        return amount / self.rate(currency, date) * self.rate(new_currency, date)
+
+    def convert_array(
+        self,
+        amounts: np.ndarray,
+        currency: str,
+        new_currency: str = "EUR",
+        date: datetime.date | None = None,
+    ) -> np.ndarray:
+        """
+        Converts all amounts with a single rate lookup.
+        """
+        factor = self.rate(new_currency, date) / self.rate(currency, date)
+        return np.asarray(amounts, dtype=np.float64) * factor
+
+    def to_json(self) -> dict:
+        return {
+            "last_date": self.last_date.isoformat(),
+            "ref_currency": self.ref_currency,
+            "rates": {
+                currency: {date.isoformat(): rate for date, rate in rates.items()}
+                for currency, rates in self.rates.items()
+            },
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "RateTable":
+        return cls(
+            rates={
+                currency: {
+                    datetime.date.fromisoformat(date): rate
+                    for date, rate in rates.items()
+                }
+                for currency, rates in data["rates"].items()
+            },
+            last_date=datetime.date.fromisoformat(data["last_date"]),
+            ref_currency=data["ref_currency"],
+        )
+
+
+def get_rate_snapshot_path() -> str:
+    return os.path.join(get_cache_path(), "rates.json")
+
+
+def load_rate_table(currency_file: str | None = None) -> RateTable:
+    """
+    Loads the rate table from the snapshot in the cache directory. The full ECB history
+    is only parsed when the snapshot is missing or older than the history file.
+    """
+    currency_file = currency_file or get_currency_file()
+    stat = os.stat(currency_file)
+    source = {"version": SNAPSHOT_VERSION, "mtime": stat.st_mtime, "size": stat.st_size}
+    snapshot_path = get_rate_snapshot_path()
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    try:
+        with open(snapshot_path) as f:
+            snapshot = json.load(f)
+        if snapshot["source"] == source:
+            return RateTable.from_json(snapshot["table"])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    table = RateTable.from_converter(CurrencyConverter(currency_file))
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"source": source, "table": table.to_json()}, f)
+    os.replace(tmp_path, snapshot_path)
+    return table
+
+
+_converter: RateTable | None = None
+_converter_lock = threading.Lock()
+
+
+def get_converter() -> RateTable:
+    """
+    The exchange rates shared by the whole run, loaded on first use.
+    """
+    global _converter
+    if _converter is None:
+        with _converter_lock:
+            if _converter is None:
+                _converter = load_rate_table()
+    return _converter
@@ -0,0 +1,141 @@
+from dataclasses import dataclass, replace
+from typing import Iterable, Iterator
+
+import numpy as np
+import pendulum
+from pendulum import Date
+
+from src.analysis import (
+    Advice,
+    ChartMode,
+    DateMatrix,
+    cheapest_per_cell,
+    get_advice,
+    typical_mask,
+)
+from src.batch import DEFAULT_WORKERS, FetchResult, fetch_expanded
+from src.flights import FlightBatch, FlightRequest
+from src.instrumentation import span
+from src.render import Renderer
+
+
+@dataclass
+class DateGrid:
+    """
+    The dates tried for one row: cell (d, r) departs on `departure_dates[d]` and
+    returns on `return_dates[r]`. One-way trips have the single return date None.
+    `cells` holds the cells worth searching, with their requests.
+    """
+
+    departure_dates: list[Date]
+    return_dates: list[Date | None]
+    cells: list[tuple[int, int, FlightRequest]]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.departure_dates), len(self.return_dates)
+
+
+def expand_request(
+    request: FlightRequest, days: int, today: Date | None = None
+) -> DateGrid:
+    """
+    Shifts the departure and return date of the request by up to `days` days either
+    way. Departures before today and returns before the departure are not searched.
+
+    A round trip is searched for every pair of dates, (2 * days + 1)² searches, and
+    not as one search per leg and date: Google Flights prices a round trip as one
+    fare, which is often cheaper than the two one-way tickets, so the price of a
+    pair cannot be put together from the prices of its legs.
+    """
+    today = today or pendulum.today().date()
+    offsets = range(-days, days + 1)
+    departure_dates = [request.departure_date.add(days=offset) for offset in offsets]
+    return_dates: list[Date | None] = [None]
+    if request.return_date:
+        return_dates = [request.return_date.add(days=offset) for offset in offsets]
+    cells = []
+    for d, departure_date in enumerate(departure_dates):
+        if departure_date < today:
+            continue
+        for r, return_date in enumerate(return_dates):
+            if return_date is not None and return_date < departure_date:
+                continue
+            cell_request = replace(
+                request, departure_date=departure_date, return_date=return_date
+            )
+            cells.append((d, r, cell_request))
+    return DateGrid(departure_dates, return_dates, cells)
+
+
+def fetch_grids(
+    requests: Iterable[tuple[str, FlightRequest | None]],
+    days: int,
+    max_workers: int = DEFAULT_WORKERS,
+) -> Iterator[tuple[int, str, FlightRequest, DateGrid, list[FetchResult | None]]]:
+    """
+    Fetch the flights of every date in the grid of every request, with the results
+    of the cells in the order of `DateGrid.cells`.
+    """
+
+    def expand(request: FlightRequest) -> tuple[DateGrid, list[FlightRequest]]:
+        grid = expand_request(request, days)
+        return grid, [cell_request for _, _, cell_request in grid.cells]
+
+    return fetch_expanded(requests, expand, max_workers)
+
+
+def get_grid_advice(
+    grid: DateGrid,
+    results: list[FetchResult | None],
+    filename: str,
+    name: str,
+    request: FlightRequest,
+    renderer: Renderer | None = None,
+    charts: ChartMode = "png",
+) -> Advice | None:
+    """
+    Analyzes the flights of all dates of the grid at once, and adds the cheapest
+    price of every pair of dates to the advice.
+    """
+    found = [
+        (d * grid.shape[1] + r, cell_request, result)
+        for (d, r, cell_request), result in zip(grid.cells, results)
+        if result is not None and len(result[0])
+    ]
+    if not found:
+        return None
+    with span("combine_grid"):
+        batch = FlightBatch.concat([result[0] for _, _, result in found])
+        cells = np.repeat(
+            [cell for cell, _, _ in found], [len(result[0]) for _, _, result in found]
+        )
+    # the buying advice of the requested dates, if they were searched
+    buying_time = found[0][2][1]
+    for _, cell_request, result in found:
+        if (
+            cell_request.departure_date == request.departure_date
+            and cell_request.return_date == request.return_date
+        ):
+            buying_time = result[1]
+    avg_duration = found[0][2][2]
+
+    advice = get_advice(
+        batch, filename, name, request, buying_time, avg_duration, renderer, charts
+    )
+    mask = typical_mask(batch)
+    cheapest = cheapest_per_cell(batch.price[mask], cells[mask], grid.shape)
+    advice.date_matrix = DateMatrix(
+        departure_dates=[
+            date.to_formatted_date_string() for date in grid.departure_dates
+        ],
+        return_dates=[
+            date.to_formatted_date_string() if date else None
+            for date in grid.return_dates
+        ],
+        prices=[
+            [None if np.isnan(price) else int(round(price)) for price in row]
+            for row in cheapest
+        ],
+    )
+    return advice
@@ -1,80 +1,94 @@
-import csv
-import io
+import datetime
+import math
 import os
-import pkgutil
 import re
-import ssl
-import urllib.request
-from dataclasses import dataclass
-from typing import Literal
+import time
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from typing import Iterator, Literal
 
-import certifi
+import numpy as np
 import pendulum
 from babel.numbers import get_currency_name, get_currency_symbol
-from currency_converter import CurrencyConverter
 from fast_flights import (
-    Airport,
     Flight,
     FlightData,
     Passengers,
-    get_flights,
-    search_airport,
+    Result,
 )
 from pendulum import Date, DateTime
 
+from src.airports import airports
+from src.cache import CacheMode, RouteDurationIndex, SearchCache, search_key
+from src.currency import get_converter
+from src.history import PriceHistory, RouteKey
+from src.instrumentation import count, span
+from src.provider import (
+    FlightProvider,
+    GoogleFlightsProvider,
+    NoFlightsFound,
+    Seat,
+)
+from src.ratelimit import RateLimiter
 
-def load_airports() -> dict[str, dict[str, str]]:
-    # Load CSV from within the PyInstaller bundle (works with --onefile)
-    data = pkgutil.get_data(__name__, "resources/airports.csv")
-    if data is None:
-        raise RuntimeError("Could not load airports.csv")
-    airports = {}
-    with io.StringIO(data.decode("utf-8")) as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            code = row["iata"].upper()
-            if code:
-                airports[code] = row
-    return airports
-
-
-def get_cache_path():
-    # Cross-platform cache dir (use appdirs if you want)
-    return os.path.join(os.path.expanduser("~"), ".cache", "hla_tool")
-
+ECONOMY_HOURS = 5
 
-def secure_urlretrieve(url, filename):
-    context = ssl.create_default_context(cafile=certifi.where())
-    with (
-        urllib.request.urlopen(url, context=context) as response,
-        open(filename, "wb") as out_file,
-    ):
-        out_file.write(response.read())
+provider: FlightProvider = GoogleFlightsProvider()
+search_cache = SearchCache()
+route_durations = RouteDurationIndex()
+price_history = PriceHistory()
+provider_limiter = RateLimiter()
 
 
-def get_currency_file():
-    os.makedirs(get_cache_path(), exist_ok=True)
-    currency_path = os.path.join(get_cache_path(), "eurofxref-hist.zip")
+def configure_provider(
+    flight_provider: FlightProvider, cache_dir: str | None = None
+) -> None:
+    """
+    Replaces the flight provider. With `cache_dir`, searches, route durations and
+    the price history are kept there instead of in the regular cache, so results of
+    a stand-in provider do not end up in the cache of real runs.
+    """
+    global provider, search_cache, route_durations, price_history
+    provider = flight_provider
+    if cache_dir is not None:
+        search_cache = SearchCache(os.path.join(cache_dir, "flights.sqlite3"))
+        route_durations = RouteDurationIndex(
+            os.path.join(cache_dir, "route_durations.json")
+        )
+        price_history = PriceHistory(os.path.join(cache_dir, "history.sqlite3"))
 
-    if not os.path.exists(currency_path):
-        print("Downloading currency data...")
-        secure_urlretrieve(ECB_URL, currency_path)
 
-    return currency_path
+def configure_cache(
+    ttl_hours: float | None = None,
+    max_entries: int | None = None,
+    mode: CacheMode | None = None,
+) -> None:
+    if ttl_hours is not None:
+        search_cache.ttl_hours = ttl_hours
+    if max_entries is not None:
+        search_cache.max_entries = max_entries
+    if mode is not None:
+        search_cache.mode = mode
 
 
-def load_currency_converter():
-    currency_file = get_currency_file()
-    return CurrencyConverter(currency_file)
+def configure_history(
+    max_age_hours: float | None = None, record: bool | None = None
+) -> None:
+    if max_age_hours is not None:
+        price_history.max_age_hours = max_age_hours
+    if record is not None:
+        price_history.record = record
 
 
-fetch_mode: Literal["local"] = "local"
-ECB_URL = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist.zip"
-airports = load_airports()
-converter = load_currency_converter()
+def configure_rate_limit(
+    requests_per_minute: float, burst: int, retries: int
+) -> RateLimiter:
+    global provider_limiter
+    provider_limiter = RateLimiter(requests_per_minute, burst, retries)
+    return provider_limiter
 
 
-@dataclass
+@dataclass(frozen=True)
 class Currency:
     name: str
     symbol: str
@@ -100,8 +114,191 @@ class ParsedFlight:
     price: float
 
 
+@lru_cache(maxsize=None)
+def load_timezone(name: str) -> pendulum.Timezone | pendulum.FixedTimezone:
+    # fixed offsets such as "+02:00" are not names in the timezone database
+    match = re.fullmatch(r"([+-])(\d{2}):(\d{2})", name)
+    if match:
+        sign = -1 if match.group(1) == "-" else 1
+        offset = sign * (int(match.group(2)) * 3600 + int(match.group(3)) * 60)
+        return pendulum.FixedTimezone(offset)
+    return pendulum.timezone(name)
+
+
+def categorize(values: list[str]) -> tuple[np.ndarray, list[str]]:
+    categories: dict[str, int] = {}
+    codes = np.fromiter(
+        (categories.setdefault(value, len(categories)) for value in values),
+        dtype=np.int32,
+        count=len(values),
+    )
+    return codes, list(categories)
+
+
+@dataclass
+class FlightBatch:
+    """
+    The flights of one search, stored column by column.
+    Departure and arrival are epoch seconds, the airline and timezones are stored as
+    codes into `airlines` and `timezones`. Unknown stops are stored as -1.
+    """
+
+    departure: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int64))
+    arrival: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int64))
+    stops: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int16))
+    price: np.ndarray = field(default_factory=lambda: np.zeros(0, np.float64))
+    airline: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int32))
+    airlines: list[str] = field(default_factory=list)
+    departure_tz: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int32))
+    arrival_tz: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int32))
+    timezones: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_columns(
+        cls,
+        names: list[str],
+        departures: list[int],
+        arrivals: list[int],
+        stops: list[int],
+        prices: list[float],
+        departure_timezones: list[str],
+        arrival_timezones: list[str],
+    ) -> "FlightBatch":
+        airline, airlines = categorize(names)
+        tz_codes, timezones = categorize(departure_timezones + arrival_timezones)
+        return cls(
+            departure=np.array(departures, dtype=np.int64),
+            arrival=np.array(arrivals, dtype=np.int64),
+            stops=np.array(stops, dtype=np.int16),
+            price=np.array(prices, dtype=np.float64),
+            airline=airline,
+            airlines=airlines,
+            departure_tz=tz_codes[: len(departures)],
+            arrival_tz=tz_codes[len(departures) :],
+            timezones=timezones,
+        )
+
+    @classmethod
+    def from_parsed(cls, flights: list[ParsedFlight]) -> "FlightBatch":
+        return cls.from_columns(
+            [flight.name for flight in flights],
+            [flight.departure.int_timestamp for flight in flights],
+            [flight.arrival.int_timestamp for flight in flights],
+            [
+                flight.stops if isinstance(flight.stops, int) else -1
+                for flight in flights
+            ],
+            [flight.price for flight in flights],
+            [flight.departure.timezone_name or "UTC" for flight in flights],
+            [flight.arrival.timezone_name or "UTC" for flight in flights],
+        )
+
+    @classmethod
+    def concat(cls, batches: list["FlightBatch"]) -> "FlightBatch":
+        """
+        Joins the batches of several searches into one, in order.
+        """
+        _, airlines = categorize([name for batch in batches for name in batch.airlines])
+        _, timezones = categorize([tz for batch in batches for tz in batch.timezones])
+        airline_codes = {name: i for i, name in enumerate(airlines)}
+        tz_codes = {tz: i for i, tz in enumerate(timezones)}
+        airline, departure_tz, arrival_tz = [], [], []
+        for batch in batches:
+            airline_map = np.array(
+                [airline_codes[name] for name in batch.airlines], dtype=np.int32
+            )
+            tz_map = np.array([tz_codes[tz] for tz in batch.timezones], dtype=np.int32)
+            if len(batch):
+                airline.append(airline_map[batch.airline])
+                departure_tz.append(tz_map[batch.departure_tz])
+                arrival_tz.append(tz_map[batch.arrival_tz])
+        if not airline:
+            return cls(airlines=airlines, timezones=timezones)
+        return cls(
+            departure=np.concatenate([batch.departure for batch in batches]),
+            arrival=np.concatenate([batch.arrival for batch in batches]),
+            stops=np.concatenate([batch.stops for batch in batches]),
+            price=np.concatenate([batch.price for batch in batches]),
+            airline=np.concatenate(airline),
+            airlines=airlines,
+            departure_tz=np.concatenate(departure_tz),
+            arrival_tz=np.concatenate(arrival_tz),
+            timezones=timezones,
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "departure": self.departure.tolist(),
+            "arrival": self.arrival.tolist(),
+            "stops": self.stops.tolist(),
+            "price": self.price.tolist(),
+            "airline": self.airline.tolist(),
+            "airlines": self.airlines,
+            "departure_tz": self.departure_tz.tolist(),
+            "arrival_tz": self.arrival_tz.tolist(),
+            "timezones": self.timezones,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "FlightBatch":
+        return cls(
+            departure=np.array(data["departure"], dtype=np.int64),
+            arrival=np.array(data["arrival"], dtype=np.int64),
+            stops=np.array(data["stops"], dtype=np.int16),
+            price=np.array(data["price"], dtype=np.float64),
+            airline=np.array(data["airline"], dtype=np.int32),
+            airlines=data["airlines"],
+            departure_tz=np.array(data["departure_tz"], dtype=np.int32),
+            arrival_tz=np.array(data["arrival_tz"], dtype=np.int32),
+            timezones=data["timezones"],
+        )
+
+    @property
+    def minutes(self) -> np.ndarray:
+        return np.abs(self.arrival - self.departure) // 60
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def __getitem__(self, i: int) -> ParsedFlight:
+        return self.flights[i]
+
+    def __iter__(self) -> Iterator[ParsedFlight]:
+        return iter(self.flights)
+
+    @cached_property
+    def flights(self) -> list[ParsedFlight]:
+        """
+        The flights as `ParsedFlight` objects, only created when asked for.
+        """
+        return [
+            ParsedFlight(
+                name=self.airlines[self.airline[i]],
+                departure=pendulum.from_timestamp(
+                    int(self.departure[i]),
+                    tz=load_timezone(self.timezones[self.departure_tz[i]]),
+                ),
+                arrival=pendulum.from_timestamp(
+                    int(self.arrival[i]),
+                    tz=load_timezone(self.timezones[self.arrival_tz[i]]),
+                ),
+                stops=int(self.stops[i]),
+                price=float(self.price[i]),
+            )
+            for i in range(len(self))
+        ]
+
+
 def parse_currency(abbreviation: str) -> Currency:
-    abbreviation = abbreviation.upper()
+    return get_currency(abbreviation.upper())
+
+
+@lru_cache(maxsize=None)
+def get_currency(abbreviation: str) -> Currency:
+    """
+    The currency of an upper case abbreviation, looked up once per run.
+    """
+    converter = get_converter()
     if not converter.currencies:
         raise Exception("Error during loading of the currencies")
     if abbreviation not in converter.currencies:
@@ -111,11 +308,14 @@ def parse_currency(abbreviation: str) -> Currency:
     return Currency(name=name, symbol=symbol, abbreviation=abbreviation)
 
 
-def get_airport_code(airport: str) -> Airport:
-    codes = search_airport(airport.replace(" ", "_"))
-    if len(codes) == 0:
+def get_airport_code(airport: str) -> str:
+    """
+    The IATA code of the airport best matching a code, city or airport name.
+    """
+    matches = airports.search(airport.replace("_", " "))
+    if len(matches) == 0:
         raise ValueError(f"Airport was not found with the string {airport}")
-    return codes[0]
+    return matches[0].iata
 
 
 def get_hours(time_str):
@@ -139,25 +339,211 @@ def deformat_price(price: str) -> float:
         raise ValueError(f"Invalid price format: {price}")
 
 
-def parse_flight_time(time_str: str, timezone: str) -> DateTime:
+MONTHS = {
+    month: i
+    for i, month in enumerate(
+        [
+            "Jan",
+            "Feb",
+            "Mar",
+            "Apr",
+            "May",
+            "Jun",
+            "Jul",
+            "Aug",
+            "Sep",
+            "Oct",
+            "Nov",
+            "Dec",
+        ],
+        start=1,
+    )
+}
+WEEKDAYS = {
+    weekday: i
+    for i, weekday in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"])
+}
+# Format: "10:30 AM on Sun, Jul 13"
+FLIGHT_TIME_PATTERN = re.compile(
+    r"(\d{1,2}):(\d{2})\s*([AP]M)\s+on\s+([A-Z][a-z]{2}),\s+([A-Z][a-z]{2})\s+(\d{1,2})"
+)
+
+
+def infer_year(month: int, day: int, weekday: int | None, reference: Date) -> int:
+    """
+    Google Flights leaves out the year. Picks the year in which the date falls on
+    the given weekday and is closest to the searched date, so a search in December
+    for a flight on January 2nd lands in the next year.
+    """
+    best_year, best_score = None, None
+    for year in (reference.year - 1, reference.year, reference.year + 1):
+        try:
+            candidate = datetime.date(year, month, day)
+        except ValueError:
+            continue
+        score = (
+            weekday is not None and candidate.weekday() != weekday,
+            abs((candidate - reference).days),
+        )
+        if best_score is None or score < best_score:
+            best_year, best_score = year, score
+    if best_year is None:
+        raise ValueError(f"Invalid date: {month}-{day}")
+    return best_year
+
+
+def match_flight_time(
+    time_str: str, reference: Date | None
+) -> tuple[int, int, int, int, int] | None:
+    match = FLIGHT_TIME_PATTERN.fullmatch(time_str.strip())
+    if match is None:
+        return None
+    hour_str, minute_str, meridiem, weekday_str, month_str, day_str = match.groups()
+    month = MONTHS.get(month_str)
+    hour = int(hour_str)
+    if month is None or not 1 <= hour <= 12:
+        return None
+    hour = hour % 12 + (12 if meridiem == "PM" else 0)
+    day = int(day_str)
+    year = infer_year(
+        month, day, WEEKDAYS.get(weekday_str), reference or pendulum.today().date()
+    )
+    return year, month, day, hour, int(minute_str)
+
+
+def parse_flight_time(
+    time_str: str, timezone: str, reference: Date | None = None
+) -> DateTime:
+    parts = match_flight_time(time_str, reference)
+    if parts is not None:
+        return pendulum.datetime(*parts, tz=load_timezone(timezone))
     # Remove "on " and append year
-    year = pendulum.now().year
+    year = (reference or pendulum.today()).year
     clean_str = time_str.replace("on ", "") + f" {year}"
     # Format: "10:30 AM Sun, Jul 13 2025"
     return pendulum.from_format(clean_str, "h:mm A ddd, MMM D YYYY", tz=timezone)
 
 
+def parse_flight_timestamp(
+    time_str: str, timezone: str, reference: Date | None = None, days_ahead: int = 0
+) -> int:
+    """
+    Like `parse_flight_time`, but returns epoch seconds without creating a pendulum DateTime.
+    `days_ahead` moves the local date forward, e.g. for arrivals marked "+1".
+    """
+    parts = match_flight_time(time_str, reference)
+    if parts is None:
+        dt = parse_flight_time(time_str, timezone, reference)
+        return dt.add(days=days_ahead).int_timestamp
+    dt = datetime.datetime(*parts, tzinfo=load_timezone(timezone))
+    if days_ahead:
+        dt += datetime.timedelta(days=days_ahead)
+    # like pendulum, take the later instant for ambiguous and skipped local times
+    return int(max(dt.timestamp(), dt.replace(fold=1).timestamp()))
+
+
 def get_timezone(airport: str) -> str:
     airport_code = airport.upper()
     info = airports.get(airport_code)
     if not info:
         raise ValueError(f"Unknown airport code: {airport_code}")
-    return info["tz"]
+    return info.tz
 
 
-def get_direct_flight_duration(request: FlightRequest) -> int:
+def search_flights(
+    flight_data: list[FlightData],
+    trip: Literal["round-trip", "one-way"],
+    seat: Literal["economy", "business"],
+    passengers: Passengers,
+    max_stops: int | None = None,
+    allow_empty: bool = False,
+) -> Result:
     """
-    Gets the duration of the flight in hours.
+    Searches flights through the cache and the rate limiter. Searches that find no
+    flights are retried, as the provider may have blocked them, unless
+    `allow_empty` is set: then finding no flights is a valid, cached answer.
+    """
+    result, _ = fetch_search(
+        flight_data, trip, seat, passengers, max_stops, allow_empty
+    )
+    return result
+
+
+def fetch_search(
+    flight_data: list[FlightData],
+    trip: Literal["round-trip", "one-way"],
+    seat: Literal["economy", "business"],
+    passengers: Passengers,
+    max_stops: int | None = None,
+    allow_empty: bool = False,
+) -> tuple[Result, float | None]:
+    """
+    Like `search_flights`, but also returns when the result was fetched from the
+    provider, or None if it was served from the cache.
+    """
+    key = search_key(flight_data, trip, seat, passengers, max_stops)
+    cached = search_cache.get(key)
+    if cached is not None:
+        count("cache_hits")
+        return cached, None
+    count("cache_misses")
+
+    def search() -> Result:
+        count("provider_calls")
+        return provider.search(flight_data, trip, seat, passengers, max_stops)
+
+    if allow_empty:
+        try:
+            result = provider_limiter.call(
+                search, is_answer=lambda e: isinstance(e, NoFlightsFound)
+            )
+        except NoFlightsFound:
+            result = Result(current_price="", flights=[])
+    else:
+        result = provider_limiter.call(
+            search,
+            is_empty=lambda result: not result.flights,
+        )
+    search_cache.put(key, result)
+    return result, time.time()
+
+
+def get_coordinates(airport: str) -> tuple[float, float]:
+    airport_code = airport.upper()
+    info = airports.get(airport_code)
+    if not info:
+        raise ValueError(f"Unknown airport code: {airport_code}")
+    return info.lat, info.lon
+
+
+def great_circle_km(departure_airport: str, arrival_airport: str) -> float:
+    lat1, lon1 = map(math.radians, get_coordinates(departure_airport))
+    lat2, lon2 = map(math.radians, get_coordinates(arrival_airport))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def estimate_flight_duration(
+    departure_airport: str,
+    arrival_airport: str,
+    cruise_speed_kmh: float = 800,
+    overhead_hours: float = 0.5,
+) -> int:
+    """
+    Estimates the duration of a direct flight in hours from the great-circle distance.
+    """
+    distance = great_circle_km(departure_airport, arrival_airport)
+    return round(distance / cruise_speed_kmh + overhead_hours)
+
+
+def probe_direct_flight_duration(request: FlightRequest) -> int | None:
+    """
+    Searches the duration of a direct flight in hours, or None when the route has no
+    direct flight. Errors of the provider are raised, so a temporary block does not
+    decide the duration of the route.
     """
     flight_data = FlightData(
         date=request.departure_date.strftime("%Y-%m-%d"),
@@ -169,27 +555,62 @@ def get_direct_flight_duration(request: FlightRequest) -> int:
     seat = "economy"
     passengers = Passengers(adults=request.family_size)
 
-    flights = get_flights(
-        flight_data=[flight_data],
-        trip=trip,
-        seat=seat,
-        passengers=passengers,
-        fetch_mode=fetch_mode,
-    )
+    with span("probe"):
+        flights = search_flights(
+            [flight_data], trip, seat, passengers, allow_empty=True
+        )
+    if not flights.flights:
+        return None
     first_parsed_flight = parse_flight(
-        flights.flights[0], request.departure_airport, request.arrival_airport
+        flights.flights[0],
+        request.departure_airport,
+        request.arrival_airport,
+        request.departure_date,
     )
     delta = first_parsed_flight.arrival.diff(first_parsed_flight.departure)
 
     return delta.in_hours()
 
 
+def get_direct_flight_duration(request: FlightRequest) -> int:
+    """
+    Gets the duration of the flight in hours.
+    The duration is looked up once per route and then remembered across rows and runs.
+    Routes without a direct flight get an estimate from the distance, which is not
+    remembered, so the route is probed again in a later run.
+    """
+    duration = route_durations.get_or_compute(
+        request.departure_airport,
+        request.arrival_airport,
+        lambda: probe_direct_flight_duration(request),
+    )
+    if duration is not None:
+        return duration
+    print(
+        f"No direct flight found from {request.departure_airport} to "
+        f"{request.arrival_airport}, estimating the duration instead."
+    )
+    return estimate_flight_duration(request.departure_airport, request.arrival_airport)
+
+
+def seat_class(duration: float, economy_hours: int = ECONOMY_HOURS) -> Seat:
+    """
+    The seat class searched for a route with a direct flight of `duration` hours.
+    """
+    return "economy" if duration <= economy_hours else "business"
+
+
 def get_raw_flights(
-    request: FlightRequest, economy_hours: int = 5
-) -> tuple[list[Flight], str, float]:
+    request: FlightRequest, economy_hours: int = ECONOMY_HOURS
+) -> tuple[list[Flight], str, float, float | None]:
+    """
+    The flights of the request, their buying advice, the duration of the direct
+    flight, and when the flights were fetched from the provider, or None if they
+    came from the search cache.
+    """
     duration = get_direct_flight_duration(request)
 
-    seat = "economy" if duration <= economy_hours else "business"
+    seat = seat_class(duration, economy_hours)
 
     strf_time_string = "%Y-%m-%d"
     flight_data = FlightData(
@@ -209,23 +630,21 @@ def get_raw_flights(
         fd_array.append(return_trip)
     passengers = Passengers(adults=request.family_size)
 
-    flights = get_flights(
-        flight_data=fd_array,
-        trip=trip,
-        seat=seat,
-        passengers=passengers,
-        fetch_mode=fetch_mode,
-    )
-    return flights.flights, flights.current_price, duration
+    with span("search"):
+        flights, fetched = fetch_search(fd_array, trip, seat, passengers)
+    return flights.flights, flights.current_price, duration, fetched
 
 
 def parse_flight(
-    flight: Flight, departure_airport: str, arrival_airport: str
+    flight: Flight,
+    departure_airport: str,
+    arrival_airport: str,
+    reference: Date | None = None,
 ) -> ParsedFlight:
     departure_timezone = get_timezone(departure_airport)
     arrival_timezone = get_timezone(arrival_airport)
-    departure_dt = parse_flight_time(flight.departure, departure_timezone)
-    arrival_dt = parse_flight_time(flight.arrival, arrival_timezone)
+    departure_dt = parse_flight_time(flight.departure, departure_timezone, reference)
+    arrival_dt = parse_flight_time(flight.arrival, arrival_timezone, reference)
 
     if flight.arrival_time_ahead.strip() == "+1":
         arrival_dt = arrival_dt.add(days=1)
@@ -242,16 +661,76 @@ def parse_flight(
     return parsed_flight
 
 
-def get_parsed_flights(request: FlightRequest) -> tuple[list[ParsedFlight], str, float]:
-    flights, buying_time, avg_duration = get_raw_flights(request)
+def history_key(request: FlightRequest) -> RouteKey:
+    return (
+        request.departure_airport,
+        request.arrival_airport,
+        request.departure_date,
+        request.return_date,
+        request.family_size,
+    )
 
-    parsed_flights = []
-    for flight in flights:
-        try:
-            parsed_flight = parse_flight(
-                flight, request.departure_airport, request.arrival_airport
-            )
-            parsed_flights.append(parsed_flight)
-        except ValueError:
-            print(f"Could not parse the flight {flight.name}. Skipping...")
-    return parsed_flights, buying_time, avg_duration
+
+def get_parsed_flights(request: FlightRequest) -> tuple[FlightBatch, str, float]:
+    """
+    The flights of the request, taken from the price history if the same search was
+    stored recently enough, and searched otherwise. Only flights that were just
+    fetched from the provider are added to the history, not those from the search
+    cache, which were added when they were fetched.
+    """
+    key = history_key(request)
+    stored = price_history.latest(key)
+    if stored is not None:
+        count("history_hits")
+        batch = FlightBatch(**stored.columns)
+        return batch, stored.buying_time, stored.duration
+    batch, buying_time, avg_duration, fetched = search_parsed_flights(request)
+    if fetched is not None:
+        price_history.add(
+            key, batch, buying_time, avg_duration, fetched, seat_class(avg_duration)
+        )
+    return batch, buying_time, avg_duration
+
+
+def search_parsed_flights(
+    request: FlightRequest,
+) -> tuple[FlightBatch, str, float, float | None]:
+    flights, buying_time, avg_duration, fetched = get_raw_flights(request)
+
+    departure_timezone = get_timezone(request.departure_airport)
+    arrival_timezone = get_timezone(request.arrival_airport)
+    with span("parse_flights"):
+        names, departures, arrivals, stops, prices = [], [], [], [], []
+        for flight in flights:
+            try:
+                departure = parse_flight_timestamp(
+                    flight.departure, departure_timezone, request.departure_date
+                )
+                arrival = parse_flight_timestamp(
+                    flight.arrival,
+                    arrival_timezone,
+                    request.departure_date,
+                    1 if flight.arrival_time_ahead.strip() == "+1" else 0,
+                )
+                price = deformat_price(flight.price)
+            except ValueError:
+                print(f"Could not parse the flight {flight.name}. Skipping...")
+                continue
+            names.append(flight.name)
+            departures.append(departure)
+            arrivals.append(arrival)
+            stops.append(flight.stops if isinstance(flight.stops, int) else -1)
+            prices.append(price)
+
+        batch = FlightBatch.from_columns(
+            names,
+            departures,
+            arrivals,
+            stops,
+            prices,
+            [departure_timezone] * len(names),
+            [arrival_timezone] * len(names),
+        )
+    count("flights_parsed", len(batch))
+    count("flights_unparsable", len(flights) - len(batch))
+    return batch, buying_time, avg_duration, fetched
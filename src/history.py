@@ -0,0 +1,270 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from pendulum import Date
+
+from src.provider import Seat
+from src.util import get_cache_path
+
+if TYPE_CHECKING:
+    from src.flights import FlightBatch
+
+DEFAULT_MAX_AGE_HOURS = 0.0
+
+RouteKey = tuple[str, str, Date, Date | None, int]
+"""Origin, destination, departure date, return date and number of passengers."""
+
+
+def iso_day(value: Date | None) -> str:
+    """
+    The date as YYYY-MM-DD, also for datetimes, or "" for a missing return date.
+    """
+    return value.strftime("%Y-%m-%d") if value else ""
+
+
+COLUMNS = {
+    "departure": np.int64,
+    "arrival": np.int64,
+    "stops": np.int16,
+    "price": np.float64,
+    "airline": np.int32,
+    "departure_tz": np.int32,
+    "arrival_tz": np.int32,
+}
+"""The array columns of a `FlightBatch`, stored as raw bytes."""
+
+FIELDS = [
+    "origin",
+    "destination",
+    "departure_date",
+    "return_date",
+    "passengers",
+    "seat",
+    "fetched",
+    "buying_time",
+    "duration",
+    "flights",
+    "airlines",
+    "timezones",
+    *COLUMNS,
+]
+"""The columns of a stored search, in the order `PriceHistory.add` writes them."""
+
+
+@dataclass
+class StoredSearch:
+    """
+    A stored search. `columns` are the fields of its `FlightBatch`.
+    """
+
+    columns: dict[str, Any]
+    buying_time: str
+    duration: float
+    fetched: float
+
+
+class PriceHistory:
+    """
+    Keeps the flights of every search in a SQLite file in the cache directory, so
+    prices can be compared across runs. A search is one row, indexed by route,
+    departure date and the time it was fetched, and its flights are stored column
+    by column as arrays. A price query therefore reads one row per matching search
+    instead of one per flight.
+
+    A search is reused instead of searched again if the same search was stored less
+    than `max_age_hours` ago. With `record` off, nothing is written.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        max_age_hours: float = DEFAULT_MAX_AGE_HOURS,
+        record: bool = True,
+    ):
+        self.path = path or os.path.join(get_cache_path(), "history.sqlite3")
+        self.max_age_hours = max_age_hours
+        self.record = record
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS searches ("
+                    "origin TEXT NOT NULL, destination TEXT NOT NULL, "
+                    "departure_date TEXT NOT NULL, return_date TEXT NOT NULL, "
+                    "passengers INTEGER NOT NULL, seat TEXT NOT NULL, "
+                    "fetched REAL NOT NULL, "
+                    "buying_time TEXT NOT NULL, duration REAL NOT NULL, "
+                    "flights INTEGER NOT NULL, airlines TEXT NOT NULL, "
+                    "timezones TEXT NOT NULL, "
+                    + ", ".join(f"{name} BLOB NOT NULL" for name in COLUMNS)
+                    + ")"
+                )
+                names = [row[1] for row in conn.execute("PRAGMA table_info(searches)")]
+                if "seat" not in names:
+                    # histories written before the seat was stored; their seat is unknown
+                    conn.execute(
+                        "ALTER TABLE searches ADD COLUMN seat TEXT NOT NULL DEFAULT ''"
+                    )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS searches_route ON searches ("
+                    "origin, destination, departure_date, fetched)"
+                )
+                conn.commit()
+                self._initialized = True
+        return conn
+
+    def add(
+        self,
+        key: RouteKey,
+        batch: "FlightBatch",
+        buying_time: str,
+        duration: float,
+        fetched: float | None = None,
+        seat: Seat = "economy",
+    ) -> None:
+        if not self.record:
+            return
+        origin, destination, departure_date, return_date, passengers = key
+        row = [
+            origin.upper(),
+            destination.upper(),
+            iso_day(departure_date),
+            iso_day(return_date),
+            passengers,
+            seat,
+            time.time() if fetched is None else fetched,
+            buying_time,
+            duration,
+            len(batch),
+            json.dumps(batch.airlines),
+            json.dumps(batch.timezones),
+        ]
+        row += [
+            np.ascontiguousarray(getattr(batch, name), dtype).tobytes()
+            for name, dtype in COLUMNS.items()
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"INSERT INTO searches ({', '.join(FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(row))})",
+                row,
+            )
+
+    def latest(self, key: RouteKey) -> StoredSearch | None:
+        """
+        The most recent stored search with this key, if it is younger than
+        `max_age_hours`.
+        """
+        if self.max_age_hours <= 0 or not os.path.exists(self.path):
+            return None
+        origin, destination, departure_date, return_date, passengers = key
+        oldest = time.time() - self.max_age_hours * 3600
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT fetched, buying_time, duration, airlines, timezones, "
+                + ", ".join(COLUMNS)
+                + " FROM searches WHERE origin = ? AND destination = ? "
+                "AND departure_date = ? AND return_date = ? AND passengers = ? "
+                "AND fetched >= ? ORDER BY fetched DESC LIMIT 1",
+                (
+                    origin.upper(),
+                    destination.upper(),
+                    iso_day(departure_date),
+                    iso_day(return_date),
+                    passengers,
+                    oldest,
+                ),
+            ).fetchone()
+        if row is None:
+            return None
+        fetched, buying_time, duration, airlines, timezones, *arrays = row
+        columns: dict[str, Any] = {
+            name: np.frombuffer(data, dtype).copy()
+            for (name, dtype), data in zip(COLUMNS.items(), arrays)
+        }
+        columns["airlines"] = json.loads(airlines)
+        columns["timezones"] = json.loads(timezones)
+        return StoredSearch(columns, buying_time, duration, fetched)
+
+    def prices(
+        self,
+        origin: str,
+        destination: str,
+        departure_from: Date,
+        departure_until: Date,
+        days: float | None = None,
+        round_trip: bool = False,
+        seat: Seat = "economy",
+        passengers: int | None = None,
+    ) -> np.ndarray:
+        """
+        All stored prices of one-way or round-trip flights in `seat` from `origin`
+        to `destination` departing between the two dates, both included, fetched in
+        the last `days` days. Prices are for the whole party of `passengers`, or per
+        person for searches of any party size if `passengers` is None.
+        """
+        if not os.path.exists(self.path):
+            return np.zeros(0, np.float64)
+        oldest = 0.0 if days is None else time.time() - days * 86400
+        query = (
+            "SELECT price, passengers FROM searches "
+            "WHERE origin = ? AND destination = ? "
+            "AND departure_date BETWEEN ? AND ? AND fetched >= ? AND seat = ? "
+            + ("AND return_date != ''" if round_trip else "AND return_date = ''")
+        )
+        params: list[Any] = [
+            origin.upper(),
+            destination.upper(),
+            iso_day(departure_from),
+            iso_day(departure_until),
+            oldest,
+            seat,
+        ]
+        if passengers is not None:
+            query += " AND passengers = ?"
+            params.append(passengers)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        if not rows:
+            return np.zeros(0, np.float64)
+        if passengers is not None:
+            return np.frombuffer(b"".join(row[0] for row in rows), np.float64)
+        return np.concatenate(
+            [np.frombuffer(data, np.float64) / size for data, size in rows]
+        )
+
+    def median_price(
+        self,
+        origin: str,
+        destination: str,
+        departure_from: Date,
+        departure_until: Date,
+        days: float | None = None,
+        round_trip: bool = False,
+        seat: Seat = "economy",
+        passengers: int | None = None,
+    ) -> float | None:
+        prices = self.prices(
+            origin,
+            destination,
+            departure_from,
+            departure_until,
+            days,
+            round_trip,
+            seat,
+            passengers,
+        )
+        return float(np.median(prices)) if len(prices) else None
@@ -1,15 +1,41 @@
 import re
 from datetime import date
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Iterator, Optional
 
 import pandas
 import pendulum
+from pendulum import Date
 from pydantic import BaseModel, field_validator, model_validator
 from pydantic_core import ValidationError
 from rich import print
 
-from src.flights import FlightRequest, parse_currency
+from src.airports import airports
+from src.flights import Currency, FlightRequest, parse_currency
+from src.instrumentation import count, span
+
+
+def to_timestamp(value: Any) -> pandas.Timestamp | None:
+    """
+    Reads a date cell as it came from the sheet. Empty cells are None, cells that
+    are not a date raise a `ValueError`.
+    """
+    if (
+        value is None
+        or value is pandas.NaT
+        or (isinstance(value, float) and pandas.isna(value))
+    ):
+        return None
+    if isinstance(value, str) and not value.strip():
+        return None
+    try:
+        timestamp = pandas.Timestamp(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Not a date: {value}")
+    if timestamp is pandas.NaT:
+        raise ValueError(f"Not a date: {value}")
+    return timestamp
 
 
 class RawFlightRequest(BaseModel):
@@ -25,6 +51,8 @@ class RawFlightRequest(BaseModel):
     def valid_airport_code(cls, v: str) -> str:
         if not re.fullmatch(r"[A-Z]{3}", v):
             raise ValueError(f"Invalid airport code: {v}")
+        if v not in airports:
+            raise ValueError(f"Unknown airport code: {v}")
         return v
 
     @field_validator("Amount_Of_Passengers")
@@ -47,17 +75,21 @@ class RawFlightRequest(BaseModel):
 
     @field_validator("Departure_Date", mode="before")
     def future_date(cls, v) -> date:
-        if v.date() < pendulum.today().date():
+        timestamp = to_timestamp(v)
+        if timestamp is None:
+            raise ValueError("Departure date is missing.")
+        if timestamp.date() < pendulum.today().date():
             raise ValueError("Departure date cannot be in the past.")
-        return v
+        return timestamp
 
     @field_validator("Return_Date", mode="before")
     def handle_nat(cls, v) -> date | None:
-        if v is pandas.NaT or pandas.isna(v):
+        timestamp = to_timestamp(v)
+        if timestamp is None:
             return None
-        if v.date() < pendulum.today().date():
+        if timestamp.date() < pendulum.today().date():
             raise ValueError("Return date cannot be in the past.")
-        return v
+        return timestamp
 
     @model_validator(mode="after")
     def check_return_after_departure(self):
@@ -104,58 +136,192 @@ def take_cli_input() -> FlightRequest:
     return request
 
 
-def merge_sheets() -> pandas.DataFrame:
-    readers = {
-        ".csv": pandas.read_csv,
-        ".xlsx": pandas.read_excel,
-        ".xls": pandas.read_excel,
-        ".ods": lambda f: pandas.read_excel(f, engine="odf"),
-    }
-    all_dfs = []
-
-    for ext, reader in readers.items():
+READERS = {
+    ".csv": pandas.read_csv,
+    ".xlsx": pandas.read_excel,
+    ".xls": pandas.read_excel,
+    ".ods": lambda f: pandas.read_excel(f, engine="odf"),
+}
+DEFAULT_CHUNKSIZE = 1000
+COLUMNS = list(RawFlightRequest.model_fields)
+
+
+def iter_sheets(chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pandas.DataFrame]:
+    """
+    Yields the rows of all Excel-like files in the current directory.
+    CSV files are read in chunks of `chunksize` rows, other files at once.
+    """
+    found = False
+    for ext, reader in READERS.items():
         for filepath in Path.cwd().glob(f"*{ext}"):
             try:
-                df = reader(filepath)
-                all_dfs.append(df)
-                print(f"Loaded {filepath} with {len(df)} rows.")
+                if ext == ".csv":
+                    chunks = pandas.read_csv(filepath, chunksize=chunksize)
+                else:
+                    chunks = [reader(filepath)]
+                rows = 0
+                for df in chunks:
+                    found = True
+                    rows += len(df)
+                    yield df
+                print(f"Loaded {filepath} with {rows} rows.")
             except Exception as e:
                 print(f"Could not read {filepath}:", e)
 
-    if all_dfs:
-        merged_df = pandas.concat(all_dfs, ignore_index=True)
-        return merged_df
-    else:
+    if not found:
         raise ValueError("No readable Excel-like files found in the current directory.")
 
 
+def merge_sheets() -> pandas.DataFrame:
+    return pandas.concat(list(iter_sheets()), ignore_index=True)
+
+
+@lru_cache(maxsize=4096)
+def to_pendulum_date(value: date) -> Date:
+    return pendulum.date(value.year, value.month, value.day)
+
+
+def validate_row(entry: dict[str, Any]) -> tuple[str, FlightRequest]:
+    """
+    Turns a row with the columns of the input sheet into a request.
+    Raises a `ValidationError` if the row is not valid.
+    """
+    raw = RawFlightRequest.model_validate(entry)
+    name = raw.Name.strip().title()
+    request = FlightRequest(
+        departure_airport=raw.Departure_Airport_Code,
+        arrival_airport=raw.Arrival_Airport_Code,
+        family_size=raw.Amount_Of_Passengers,
+        host_currency=parse_currency(raw.Home_Currency),
+        departure_date=to_pendulum_date(raw.Departure_Date),
+        return_date=to_pendulum_date(raw.Return_Date) if raw.Return_Date else None,
+    )
+    return name, request
+
+
+def parse_row(entry: pandas.Series) -> tuple[str, FlightRequest | None]:
+    try:
+        return validate_row(entry.to_dict())
+    except ValidationError as e:
+        print(f"Error encountered while parsing {entry.Name.strip().title()}:")
+        print(e.errors())
+        return "Error", None
+
+
+def memoize_column(
+    column: pandas.Series, function: Callable[[Any], Any]
+) -> pandas.Series:
+    results = {value: function(value) for value in column.unique()}
+    return column.map(results)
+
+
+def try_parse_currency(value: Any) -> Currency | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        return parse_currency(value)
+    except ValueError:
+        return None
+
+
+def valid_rows(df: pandas.DataFrame) -> pandas.Series:
+    """
+    Checks all rows at once. Rows that pass are valid for `RawFlightRequest` as well,
+    rows that fail are validated again one by one to report the errors.
+    """
+    if any(column not in df for column in COLUMNS):
+        return pandas.Series(False, index=df.index)
+    today = pandas.Timestamp(pendulum.today().date())
+    departure = df["Departure_Date"]
+    returns = df["Return_Date"]
+    passengers = pandas.to_numeric(df["Amount_Of_Passengers"], errors="coerce")
+
+    valid = df["Name"].map(lambda name: isinstance(name, str))
+    for column in ["Departure_Airport_Code", "Arrival_Airport_Code"]:
+        codes = df[column]
+        valid &= memoize_column(
+            codes,
+            lambda code: isinstance(code, str)
+            and re.fullmatch(r"[A-Z]{3}", code) is not None
+            and code in airports,
+        ).astype(bool)
+    valid &= (
+        departure.notna()
+        & (departure == departure.dt.normalize())
+        & (departure >= today)
+    )
+    valid &= returns.isna() | (
+        (returns == returns.dt.normalize())
+        & (returns >= today)
+        & (returns >= departure)
+    )
+    valid &= passengers.notna() & (passengers % 1 == 0) & (passengers > 0)
+    valid &= memoize_column(df["Home_Currency"], try_parse_currency).notna()
+    return valid
+
+
 def parse_df(df: pandas.DataFrame) -> list[tuple[str, FlightRequest | None]]:
+    """
+    Parses all rows of a sheet. Invalid rows, including rows with a date that could
+    not be read, are validated one by one with their original cells, so the error
+    is reported.
+    """
+    original = df
+    df = df.copy()
+    unreadable = pandas.Series(False, index=df.index)
+    for column in ["Departure_Date", "Return_Date"]:
+        if column in df:
+            df[column] = pandas.to_datetime(df[column], errors="coerce")
+            unreadable |= df[column].isna() & original[column].notna()
+    valid = (valid_rows(df) & ~unreadable).to_numpy()
+    if not valid.any():
+        return [parse_row(entry) for _, entry in original.iterrows()]
+
+    names = df["Name"].tolist()
+    departure_airports = df["Departure_Airport_Code"].tolist()
+    arrival_airports = df["Arrival_Airport_Code"].tolist()
+    passengers = pandas.to_numeric(df["Amount_Of_Passengers"], errors="coerce")
+    passengers = passengers.where(valid, 0).astype(int).tolist()
+    currencies = memoize_column(df["Home_Currency"], try_parse_currency).tolist()
+    departure_dates = df["Departure_Date"].dt.date.tolist()
+    return_dates = df["Return_Date"].dt.date.tolist()
+
     request_list = []
-    for _, entry in df.iterrows():
-        try:
-            raw = RawFlightRequest.model_validate(entry.to_dict())
-            name = raw.Name.strip().title()
-            request = FlightRequest(
-                departure_airport=raw.Departure_Airport_Code,
-                arrival_airport=raw.Arrival_Airport_Code,
-                family_size=raw.Amount_Of_Passengers,
-                host_currency=parse_currency(raw.Home_Currency),
-                departure_date=pendulum.date(
-                    raw.Departure_Date.year,
-                    raw.Departure_Date.month,
-                    raw.Departure_Date.day,
-                ),
-                return_date=(
-                    pendulum.date(
-                        raw.Return_Date.year, raw.Return_Date.month, raw.Return_Date.day
-                    )
-                    if raw.Return_Date
-                    else None
-                ),
-            )
-            request_list.append((name, request))
-        except ValidationError as e:
-            print(f"Error encountered while parsing {entry.Name.strip().title()}:")
-            print(e.errors())
-            request_list.append(("Error", None))
+    for i, is_valid in enumerate(valid):
+        if not is_valid:
+            request_list.append(parse_row(original.iloc[i]))
+            continue
+        request = FlightRequest(
+            departure_airport=departure_airports[i],
+            arrival_airport=arrival_airports[i],
+            family_size=passengers[i],
+            host_currency=currencies[i],
+            departure_date=to_pendulum_date(departure_dates[i]),
+            return_date=(
+                to_pendulum_date(return_dates[i])
+                if pandas.notna(return_dates[i])
+                else None
+            ),
+        )
+        request_list.append((names[i].strip().title(), request))
     return request_list
+
+
+def iter_requests(
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> Iterator[tuple[str, FlightRequest | None]]:
+    """
+    Yields the parsed requests of all Excel-like files in the current directory,
+    chunk by chunk, so they can be fetched before all files are read.
+    """
+    sheets = iter_sheets(chunksize)
+    while True:
+        with span("load_sheet"):
+            df = next(sheets, None)
+        if df is None:
+            return
+        with span("parse_rows"):
+            requests = parse_df(df)
+        count("rows_read", len(requests))
+        count("rows_invalid", sum(request is None for _, request in requests))
+        yield from requests
@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import ContextManager, Iterator
+
+PROMETHEUS_PREFIX = "hla_tool"
+
+
+@dataclass
+class SpanStats:
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+
+class Instrumentation:
+    """
+    Collects the time spent in every pipeline stage and counts events such as cache
+    hits. Spans in worker threads are added up, so the total of a stage can be more
+    than the wall time of the run. While disabled, `span` and `count` do nothing.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.spans: dict[str, SpanStats] = {}
+        self.counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str) -> ContextManager[None]:
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Adds a span that was timed elsewhere, such as in a worker process.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.spans.setdefault(name, SpanStats()).add(seconds)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self) -> str:
+        lines = [f"{'Stage':<22} {'Count':>7} {'Total (s)':>10} {'Mean (ms)':>10}"]
+        for name, stats in self.spans.items():
+            mean = stats.total_seconds / stats.count * 1000 if stats.count else 0.0
+            lines.append(
+                f"{name:<22} {stats.count:>7} {stats.total_seconds:>10.2f} {mean:>10.1f}"
+            )
+        for name, value in self.counters.items():
+            lines.append(f"{name:<22} {value:>7}")
+        return "\n".join(lines)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "spans": {name: asdict(stats) for name, stats in self.spans.items()},
+                "counters": self.counters,
+            },
+            indent=2,
+        )
+
+    def to_prometheus(self) -> str:
+        lines = [
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds summary",
+        ]
+        for name, stats in self.spans.items():
+            lines.append(
+                f'{PROMETHEUS_PREFIX}_stage_seconds_sum{{stage="{name}"}} '
+                f"{stats.total_seconds}"
+            )
+            lines.append(
+                f'{PROMETHEUS_PREFIX}_stage_seconds_count{{stage="{name}"}} '
+                f"{stats.count}"
+            )
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name}_total counter")
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """
+        Writes the collected data to `path`, as Prometheus text if it ends in ".prom"
+        and as JSON otherwise.
+        """
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        with open(path, "w") as f:
+            f.write(text)
+
+
+instrumentation = Instrumentation()
+
+
+def span(name: str) -> ContextManager[None]:
+    return instrumentation.span(name)
+
+
+def count(name: str, amount: int = 1) -> None:
+    instrumentation.count(name, amount)
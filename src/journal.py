@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict
+
+import pendulum
+
+from src.analysis import Advice
+from src.batch import FetchResult
+from src.flights import FlightBatch, FlightRequest
+from src.util import get_cache_path
+
+
+def row_key(name: str, request: FlightRequest) -> str:
+    row = [
+        name,
+        request.departure_airport,
+        request.arrival_airport,
+        request.family_size,
+        request.host_currency.abbreviation,
+        request.departure_date.isoformat(),
+        request.return_date.isoformat() if request.return_date else None,
+    ]
+    return hashlib.sha256(json.dumps(row).encode("utf-8")).hexdigest()
+
+
+class RunJournal:
+    """
+    Append-only record of the rows a run has finished, with their flights and advice.
+    A run started with `resume=True` takes the flights of finished rows from the
+    journal instead of searching them again. Otherwise the journal starts empty.
+    """
+
+    def __init__(self, path: str | None = None, resume: bool = False):
+        self.path = path or os.path.join(get_cache_path(), "journal.jsonl")
+        self.finished: dict[str, dict] = {}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if resume:
+            self._load()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line is cut short if the run was killed while writing
+                        continue
+                    self.finished[record["key"]] = record
+        except OSError:
+            pass
+
+    def is_finished(self, name: str, request: FlightRequest) -> bool:
+        return row_key(name, request) in self.finished
+
+    def get(self, name: str, request: FlightRequest) -> FetchResult | None:
+        record = self.finished.get(row_key(name, request))
+        if record is None:
+            return None
+        return (
+            FlightBatch.from_json(record["flights"]),
+            record["buying_time"],
+            record["avg_duration"],
+        )
+
+    def append(
+        self, name: str, request: FlightRequest, result: FetchResult, advice: Advice
+    ) -> None:
+        flights, buying_time, avg_duration = result
+        if not isinstance(flights, FlightBatch):
+            flights = FlightBatch.from_parsed(flights)
+        record = {
+            "key": row_key(name, request),
+            "flights": flights.to_json(),
+            "buying_time": buying_time,
+            "avg_duration": avg_duration,
+            "advice": asdict(advice),
+        }
+        line = json.dumps(
+            record,
+            default=lambda o: o.isoformat() if isinstance(o, pendulum.Date) else str(o),
+        )
+        with open(self.path, "a") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.finished[record["key"]] = record
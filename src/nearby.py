@@ -0,0 +1,114 @@
+from dataclasses import replace
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from fast_flights import Airport
+
+from src.airports import airports
+from src.analysis import Advice, ChartMode, get_advice
+from src.batch import DEFAULT_WORKERS, FetchResult, fetch_expanded
+from src.flights import ECONOMY_HOURS, FlightBatch, FlightRequest
+from src.instrumentation import span
+from src.render import Renderer
+
+DEFAULT_MAX_ALTERNATIVES = 2
+
+
+@lru_cache(maxsize=1)
+def served_airports() -> frozenset[str]:
+    """
+    The IATA codes Google Flights knows. Many small airports in airports.csv have no
+    scheduled flights, so searching them would only cost lookups.
+    """
+    return frozenset(airport.value for airport in Airport)
+
+
+def alternative_airports(code: str, radius_km: float, limit: int) -> list[str]:
+    served = served_airports()
+    return [
+        record.iata
+        for record, _ in airports.nearby(code, radius_km)
+        if record.iata in served
+    ][:limit]
+
+
+def expand_airports(
+    request: FlightRequest,
+    radius_km: float,
+    limit: int = DEFAULT_MAX_ALTERNATIVES,
+) -> list[FlightRequest]:
+    """
+    The request itself, followed by the same trip from and to up to `limit` other
+    airports within `radius_km` of the departure and arrival airport.
+    """
+    origin = request.departure_airport.upper()
+    destination = request.arrival_airport.upper()
+    origins = [origin] + alternative_airports(origin, radius_km, limit)
+    destinations = [destination] + alternative_airports(destination, radius_km, limit)
+    return [
+        replace(request, departure_airport=departure, arrival_airport=arrival)
+        for departure in origins
+        for arrival in destinations
+        if departure != arrival
+    ]
+
+
+def fetch_nearby(
+    requests: Iterable[tuple[str, FlightRequest | None]],
+    radius_km: float,
+    limit: int = DEFAULT_MAX_ALTERNATIVES,
+    max_workers: int = DEFAULT_WORKERS,
+) -> Iterator[
+    tuple[int, str, FlightRequest, list[FlightRequest], list[FetchResult | None]]
+]:
+    """
+    Fetch the flights of every request and of its alternative routes.
+    """
+
+    def expand(
+        request: FlightRequest,
+    ) -> tuple[list[FlightRequest], list[FlightRequest]]:
+        routes = expand_airports(request, radius_km, limit)
+        return routes, routes
+
+    return fetch_expanded(requests, expand, max_workers)
+
+
+def get_nearby_advice(
+    routes: list[FlightRequest],
+    results: list[FetchResult | None],
+    filename: str,
+    name: str,
+    request: FlightRequest,
+    renderer: Renderer | None = None,
+    charts: ChartMode = "png",
+) -> Advice | None:
+    """
+    Analyzes the flights of all routes at once. Routes are only merged with the
+    requested route if they fly the same class, so business and economy prices
+    are not compared.
+    """
+    found = [
+        (route, result)
+        for route, result in zip(routes, results)
+        if result is not None and len(result[0])
+    ]
+    if not found:
+        return None
+    # the first route is the requested one, if it has flights
+    _, buying_time, avg_duration = found[0][1]
+    business = avg_duration > ECONOMY_HOURS
+    found = [
+        (route, result)
+        for route, result in found
+        if (result[2] > ECONOMY_HOURS) == business
+    ]
+    with span("combine_routes"):
+        batch = FlightBatch.concat([result[0] for _, result in found])
+    advice = get_advice(
+        batch, filename, name, request, buying_time, avg_duration, renderer, charts
+    )
+    advice.routes = [
+        f"{route.departure_airport}-{route.arrival_airport}" for route, _ in found
+    ]
+    return advice
@@ -1,13 +1,16 @@
 import json
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
 from dataclasses import asdict
 from pathlib import Path
 
 import pendulum
 
 from .analysis import Advice
+from .instrumentation import span
 from .util import get_template_dir
 
 
@@ -17,27 +20,56 @@ def get_typst_path():
     return "typst"
 
 
+def json_default(o):
+    return o.isoformat() if isinstance(o, pendulum.Date) else str(o)
+
+
 def convert_advices_to_typst_pdf(advices: list[Advice]) -> None:
     template_dir = get_template_dir()
     advices_json = [asdict(advice) for advice in advices]
     with open(template_dir + "/advices.json", "w") as outfile:
-        json.dump(
-            advices_json,
-            outfile,
-            indent=4,
-            default=lambda o: o.isoformat() if isinstance(o, pendulum.Date) else str(o),
+        json.dump(advices_json, outfile, indent=4, default=json_default)
+    with span("typst_compile"):
+        subprocess.run(
+            [
+                get_typst_path(),
+                "compile",
+                template_dir + "/report.typ",
+                f"report_{pendulum.today().to_date_string()}.pdf",
+            ],
+            check=True,
         )
-    subprocess.run(
-        [
-            get_typst_path(),
-            "compile",
-            template_dir + "/report.typ",
-            f"report_{pendulum.today().to_date_string()}.pdf",
-        ],
-        check=True,
-    )
 
     # delete temp files
     Path(template_dir).joinpath("advices.json").unlink()
     for advice in advices:
-        Path(template_dir).joinpath(advice.pareto_path).unlink()
+        if advice.pareto_path:
+            Path(template_dir).joinpath(advice.pareto_path).unlink()
+
+
+def render_report(advices: list[Advice]) -> bytes:
+    """
+    Compiles the report of advices with Typst-drawn plots in a directory of its own,
+    so several reports can be compiled at the same time, and returns the PDF.
+    """
+    template_dir = get_template_dir()
+    with tempfile.TemporaryDirectory() as work_dir:
+        for template in ["report.typ", "plot.typ"]:
+            shutil.copy(os.path.join(template_dir, template), work_dir)
+        with open(os.path.join(work_dir, "advices.json"), "w") as outfile:
+            json.dump(
+                [asdict(advice) for advice in advices], outfile, default=json_default
+            )
+        report_path = os.path.join(work_dir, "report.pdf")
+        with span("typst_compile"):
+            subprocess.run(
+                [
+                    get_typst_path(),
+                    "compile",
+                    os.path.join(work_dir, "report.typ"),
+                    report_path,
+                ],
+                check=True,
+            )
+        with open(report_path, "rb") as f:
+            return f.read()
@@ -0,0 +1,413 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, Literal, Protocol
+from urllib.parse import urlencode
+
+from fast_flights import FlightData, Passengers, Result, get_flights
+from fast_flights.core import parse_response
+from fast_flights.filter import TFSData
+
+from src.browser import BrowserPool
+from src.cache import dump_result, load_result, search_key
+
+GOOGLE_FLIGHTS_URL = "https://www.google.com/travel/flights"
+
+Trip = Literal["round-trip", "one-way"]
+Seat = Literal["economy", "business"]
+FetchMode = Literal["common", "local"]
+
+
+class ProviderThrottled(RuntimeError):
+    """
+    Raised when the flight provider refuses a search because of too many requests.
+    """
+
+
+class NoFlightsFound(RuntimeError):
+    """
+    Raised when a search page was loaded but lists no flights.
+    """
+
+
+def is_provider_failure(e: Exception) -> bool:
+    """
+    Whether a search failed because of the provider or the connection to it, so it
+    may succeed when tried again later: a refused or throttled request, a page
+    without flights, or a network or browser error. Other errors, such as a missing
+    browser, an invalid search or a search missing from a replay, fail again.
+    """
+    if isinstance(e, NotImplementedError):
+        return False
+    if isinstance(e, (AssertionError, RuntimeError, OSError)):
+        return True
+    # the HTTP client and the browser have exception types of their own
+    return type(e).__module__.split(".")[0] in ("primp", "playwright")
+
+
+@contextmanager
+def no_flights_found() -> Iterator[None]:
+    """
+    fast_flights raises a plain `RuntimeError` when a page lists no flights, this
+    raises it as `NoFlightsFound` instead.
+    """
+    try:
+        yield
+    except RuntimeError as e:
+        if type(e) is RuntimeError and str(e).startswith("No flights found"):
+            raise NoFlightsFound(str(e)) from e
+        raise
+
+
+def nonstop_only(flight_data: list[FlightData], max_stops: int | None) -> bool:
+    """
+    A search for nonstop flights only. Many routes have none, so finding no flights
+    is a valid answer to it rather than a sign of being blocked.
+    """
+    return max_stops == 0 or all(fd.max_stops == 0 for fd in flight_data)
+
+
+class FlightProvider(Protocol):
+    def search(
+        self,
+        flight_data: list[FlightData],
+        trip: Trip,
+        seat: Seat,
+        passengers: Passengers,
+        max_stops: int | None = None,
+    ) -> Result: ...
+
+
+class GoogleFlightsProvider:
+    """
+    Searches Google Flights through fast_flights: with a plain HTTP request in
+    "common" mode, or with a new Playwright browser per search in "local" mode.
+    """
+
+    def __init__(self, fetch_mode: FetchMode = "local"):
+        self.fetch_mode: FetchMode = fetch_mode
+
+    def search(
+        self,
+        flight_data: list[FlightData],
+        trip: Trip,
+        seat: Seat,
+        passengers: Passengers,
+        max_stops: int | None = None,
+    ) -> Result:
+        with no_flights_found():
+            return get_flights(
+                flight_data=flight_data,
+                trip=trip,
+                seat=seat,
+                passengers=passengers,
+                fetch_mode=self.fetch_mode,
+                max_stops=max_stops,
+            )
+
+
+@dataclass
+class HtmlResponse:
+    text: str
+
+    @property
+    def text_markdown(self) -> str:
+        # parse_response quotes the page in its error when it finds no flights
+        return self.text
+
+
+def search_url(
+    flight_data: list[FlightData],
+    trip: Trip,
+    seat: Seat,
+    passengers: Passengers,
+    max_stops: int | None = None,
+) -> str:
+    """
+    The Google Flights page of a search, like fast_flights builds it.
+    """
+    tfs = TFSData.from_interface(
+        flight_data=flight_data,
+        trip=trip,
+        passengers=passengers,
+        seat=seat,
+        max_stops=max_stops,
+    )
+    params = {
+        "tfs": tfs.as_b64().decode("utf-8"),
+        "hl": "en",
+        "tfu": "EgQIABABIgA",
+        "curr": "",
+    }
+    return f"{GOOGLE_FLIGHTS_URL}?{urlencode(params)}"
+
+
+async def fetch_flights_page(context, url: str) -> str:
+    page = await context.new_page()
+    try:
+        await page.goto(url)
+        if page.url.startswith("https://consent.google.com"):
+            await page.click('text="Accept all"')
+        await page.locator(".eQ35Ce").wait_for()
+        return await page.evaluate(
+            "() => document.querySelector('[role=\"main\"]').innerHTML"
+        )
+    finally:
+        await page.close()
+
+
+class PooledBrowserProvider:
+    """
+    Searches Google Flights like the "local" fetch mode of fast_flights, but in the
+    warm browser contexts of a `BrowserPool` instead of a new browser per search.
+    """
+
+    def __init__(self, pool: BrowserPool):
+        self.pool = pool
+
+    def search(
+        self,
+        flight_data: list[FlightData],
+        trip: Trip,
+        seat: Seat,
+        passengers: Passengers,
+        max_stops: int | None = None,
+    ) -> Result:
+        url = search_url(flight_data, trip, seat, passengers, max_stops)
+        html = self.pool.run(lambda context: fetch_flights_page(context, url))
+        with no_flights_found():
+            return parse_response(HtmlResponse(html))  # type: ignore
+
+
+@dataclass
+class BackendStats:
+    """
+    Moving averages of the success rate and latency of a fetch backend, starting
+    from the expected latency.
+    """
+
+    latency: float
+    success_rate: float = 1.0
+    calls: int = 0
+    failures: int = 0
+
+    def add(self, success: bool, seconds: float, weight: float = 0.2) -> None:
+        self.calls += 1
+        self.failures += not success
+        self.success_rate += weight * (success - self.success_rate)
+        self.latency += weight * (seconds - self.latency)
+
+
+class AdaptiveProvider:
+    """
+    Tries the fetch backends from cheapest to most expensive, and escalates to the
+    next one when a backend fails, is blocked or finds no flights. The last backend
+    is always tried. An earlier backend is skipped while trying it first is expected
+    to take longer than going straight to the last one, that is while its latency
+    is more than its success rate times the latency of the last backend. Every
+    `probe_every` searches it is tried anyway, so it can recover.
+
+    A search for nonstop flights that finds none is answered as it is: it is not
+    escalated and does not count as a failure of the backend.
+    """
+
+    def __init__(
+        self,
+        backends: list[tuple[str, FlightProvider, float]],
+        probe_every: int = 20,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.backends = [(name, backend) for name, backend, _ in backends]
+        self.stats = {name: BackendStats(latency) for name, _, latency in backends}
+        self.probe_every = probe_every
+        self._clock = clock
+        self._searches = 0
+        self._lock = threading.Lock()
+
+    def _worth_trying(self, name: str, probe: bool) -> bool:
+        last = self.stats[self.backends[-1][0]]
+        stats = self.stats[name]
+        return probe or stats.latency < stats.success_rate * last.latency
+
+    def search(
+        self,
+        flight_data: list[FlightData],
+        trip: Trip,
+        seat: Seat,
+        passengers: Passengers,
+        max_stops: int | None = None,
+    ) -> Result:
+        with self._lock:
+            self._searches += 1
+            probe = self._searches % self.probe_every == 0
+            chosen = [
+                (name, backend)
+                for name, backend in self.backends[:-1]
+                if self._worth_trying(name, probe)
+            ]
+        chosen.append(self.backends[-1])
+        for name, backend in chosen:
+            start = self._clock()
+            error: Exception | None = None
+            try:
+                result = backend.search(flight_data, trip, seat, passengers, max_stops)
+            except Exception as e:
+                error = e
+            no_flights = isinstance(error, NoFlightsFound) or (
+                error is None and not result.flights
+            )
+            if no_flights and nonstop_only(flight_data, max_stops):
+                if error is not None:
+                    raise error
+                return result
+            success = error is None and bool(result.flights)
+            with self._lock:
+                self.stats[name].add(success, self._clock() - start)
+            if success:
+                return result
+        # all backends failed, report how the last one did
+        if error is not None:
+            raise error
+        return result
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name}: {stats.calls} searches, {stats.failures} failed, "
+            f"{stats.latency:.1f}s"
+            for name, stats in self.stats.items()
+        )
+
+
+def make_backend(
+    backend: Literal["auto", "http", "browser"], pool: BrowserPool
+) -> FlightProvider:
+    """
+    The provider for live searches. "auto" starts with plain HTTP requests, which
+    take about a second, and falls back to the browser, which takes several.
+    """
+    http = GoogleFlightsProvider("common")
+    browser = PooledBrowserProvider(pool)
+    if backend == "http":
+        return http
+    if backend == "browser":
+        return browser
+    return AdaptiveProvider([("http", http, 1.0), ("browser", browser, 5.0)])
+
+
+class RecordingProvider:
+    """
+    Passes searches on to another provider and appends every result to a JSON lines
+    file, so they can be served again by a `ReplayProvider`.
+    """
+
+    def __init__(self, path: str, provider: FlightProvider | None = None):
+        self.path = path
+        self.provider = provider or GoogleFlightsProvider()
+        self._lock = threading.Lock()
+
+    def search(
+        self,
+        flight_data: list[FlightData],
+        trip: Trip,
+        seat: Seat,
+        passengers: Passengers,
+        max_stops: int | None = None,
+    ) -> Result:
+        result = self.provider.search(flight_data, trip, seat, passengers, max_stops)
+        entry = dump_result(result)
+        entry["key"] = search_key(flight_data, trip, seat, passengers, max_stops)
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line)
+        return result
+
+
+class ReplayProvider:
+    """
+    Serves the searches recorded by a `RecordingProvider` without going online.
+    Searches that were not recorded get one of the recorded results, picked by the
+    search key, unless `strict` is set.
+
+    To load test the pipeline, every search can be delayed by `latency` seconds
+    (plus up to `jitter` seconds), fail with probability `error_rate`, or be refused
+    with `ProviderThrottled` with probability `throttle_rate` and whenever more than
+    `max_requests_per_minute` searches were made in the last minute.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_requests_per_minute: float | None = None,
+        strict: bool = False,
+        seed: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.path = path
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_requests_per_minute = max_requests_per_minute
+        self.strict = strict
+        self.recordings = self._load()
+        self._keys = sorted(self.recordings)
+        self._random = random.Random(seed)
+        self._clock = clock
+        self._sleep = sleep
+        self._recent: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, dict]:
+        recordings = {}
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    recordings[entry.pop("key")] = entry
+        return recordings
+
+    def _over_limit(self) -> bool:
+        if self.max_requests_per_minute is None:
+            return False
+        now = self._clock()
+        while self._recent and now - self._recent[0] >= 60:
+            self._recent.popleft()
+        self._recent.append(now)
+        return len(self._recent) > self.max_requests_per_minute
+
+    def search(
+        self,
+        flight_data: list[FlightData],
+        trip: Trip,
+        seat: Seat,
+        passengers: Passengers,
+        max_stops: int | None = None,
+    ) -> Result:
+        key = search_key(flight_data, trip, seat, passengers, max_stops)
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            throttled = self._over_limit() or self._random.random() < self.throttle_rate
+            failed = self._random.random() < self.error_rate
+        self._sleep(delay)
+        if throttled:
+            raise ProviderThrottled("429 Too Many Requests (replayed)")
+        if failed:
+            raise RuntimeError("The flight provider failed (replayed)")
+        entry = self.recordings.get(key)
+        if entry is None:
+            if self.strict or not self._keys:
+                raise LookupError(f"No recorded flight search for {flight_data}")
+            entry = self.recordings[self._keys[int(key, 16) % len(self._keys)]]
+        return load_result(entry)
@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from src.provider import is_provider_failure
+
+T = TypeVar("T")
+
+DEFAULT_REQUESTS_PER_MINUTE = 30.0
+DEFAULT_BURST = 5
+DEFAULT_RETRIES = 3
+
+
+@dataclass
+class ProviderMetrics:
+    calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    throttled_seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.calls} flight lookups, {self.retries} retries, "
+            f"{self.failures} failures, {self.throttled_seconds:.1f}s throttled"
+        )
+
+
+class TokenBucket:
+    """
+    Allows `burst` calls at once, refilled at `requests_per_minute`.
+    The refill rate can be lowered temporarily with `slow_down` when the provider
+    pushes back, and creeps back to the configured rate on every success.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        burst: int = DEFAULT_BURST,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.burst = max(1, burst)
+        self.rate = requests_per_minute / 60
+        self.tokens = float(self.burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Blocks until a call is allowed and returns the number of seconds waited.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+    def slow_down(
+        self, factor: float = 0.5, min_requests_per_minute: float = 1
+    ) -> None:
+        with self._lock:
+            self._refill()
+            self.rate = max(min_requests_per_minute / 60, self.rate * factor)
+
+    def speed_up(self, step_requests_per_minute: float | None = None) -> None:
+        """
+        Raises the refill rate by `step_requests_per_minute`, by default a thirtieth
+        of the configured rate, so the recovery takes as many calls at any rate.
+        """
+        if step_requests_per_minute is None:
+            step_requests_per_minute = self.requests_per_minute / 30
+        with self._lock:
+            self._refill()
+            max_rate = self.requests_per_minute / 60
+            self.rate = min(max_rate, self.rate + step_requests_per_minute / 60)
+
+
+class RateLimiter:
+    """
+    Throttles calls to the flight provider with a token bucket and retries failed or
+    empty responses with exponential backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        burst: int = DEFAULT_BURST,
+        retries: int = DEFAULT_RETRIES,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.bucket = TokenBucket(requests_per_minute, burst, clock, sleep)
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = ProviderMetrics()
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        is_empty: Callable[[T], bool] = lambda _: False,
+        is_answer: Callable[[Exception], bool] = lambda _: False,
+        is_failure: Callable[[Exception], bool] = is_provider_failure,
+    ) -> T:
+        """
+        Calls `fn`, retrying empty results and errors for which `is_failure` holds,
+        the failures of the provider. Other errors would fail again and are raised
+        at once, as are errors for which `is_answer` holds, which are what the
+        provider has to say. Neither lowers the rate.
+        """
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            with self._lock:
+                self.metrics.calls += 1
+                self.metrics.throttled_seconds += waited
+            try:
+                result = fn()
+                if is_empty(result):
+                    raise RuntimeError("The flight provider returned no flights")
+            except Exception as e:
+                if is_answer(e):
+                    raise
+                if not is_failure(e):
+                    with self._lock:
+                        self.metrics.failures += 1
+                    raise
+                self.bucket.slow_down()
+                if attempt >= self.retries:
+                    with self._lock:
+                        self.metrics.failures += 1
+                    raise
+                delay = self.backoff_delay(attempt)
+                with self._lock:
+                    self.metrics.retries += 1
+                    self.metrics.throttled_seconds += delay
+                self._sleep(delay)
+                attempt += 1
+                continue
+            self.bucket.speed_up()
+            return result
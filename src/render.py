@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from src.instrumentation import instrumentation, span
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+DEFAULT_RENDER_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+
+@dataclass(frozen=True)
+class PlotJob:
+    minutes: np.ndarray
+    prices: np.ndarray
+    pareto_minutes: np.ndarray
+    pareto_prices: np.ndarray
+    path: str
+    title: str
+
+
+# one figure per process, cleared between plots instead of opening a new one
+_figure: "Figure | None" = None
+
+
+def get_figure() -> "Figure":
+    global _figure
+    if _figure is None:
+        # matplotlib is only imported when a plot is drawn
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        _figure = Figure(figsize=(10, 6))
+        FigureCanvasAgg(_figure)
+    _figure.clear()
+    return _figure
+
+
+def render_plot(job: PlotJob) -> str:
+    with span("plot"):
+        return draw_plot(job)
+
+
+def render_plot_timed(job: PlotJob) -> tuple[str, float]:
+    """
+    Renders the plot in a worker process, where spans are not collected, and returns
+    the seconds it took along with the path, to be recorded by the parent.
+    """
+    start = time.perf_counter()
+    path = draw_plot(job)
+    return path, time.perf_counter() - start
+
+
+def draw_plot(job: PlotJob) -> str:
+    figure = get_figure()
+    ax = figure.add_subplot()
+    ax.scatter(job.minutes, job.prices, c="lightgray", label="All flights")
+    ax.scatter(job.pareto_minutes, job.pareto_prices, c="red", label="Best flights")
+    ax.plot(job.pareto_minutes, job.pareto_prices, "r--", alpha=0.5)
+
+    ax.set_xlabel("Duration (minutes)")
+    ax.set_ylabel("Price (€)")
+    ax.set_title(job.title)
+    ax.legend()
+    ax.grid(True)
+    figure.savefig(job.path)
+    figure.clear()
+    return job.path
+
+
+class Renderer:
+    """
+    Renders plots in a pool of worker processes, so plotting overlaps with fetching
+    flights. With `max_workers=0` plots are rendered right away in this process.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_RENDER_WORKERS):
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._futures: list[Future] = []
+
+    def __enter__(self) -> "Renderer":
+        if self.max_workers > 0:
+            # the parent runs threads (fetching, the browser), which must not be forked
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self
+
+    def submit(self, job: PlotJob) -> None:
+        if self._executor is None:
+            render_plot(job)
+        else:
+            self._futures.append(self._executor.submit(render_plot_timed, job))
+
+    def wait(self) -> list[str]:
+        with span("plot_wait"):
+            results = [future.result() for future in self._futures]
+        self._futures = []
+        for _, seconds in results:
+            instrumentation.record("plot", seconds)
+        return [path for path, _ in results]
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=exc_type is not None)
+                self._executor = None
@@ -0,0 +1,215 @@
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import pandas
+from pydantic_core import ValidationError
+
+import src.flights
+from src.airports import airports
+from src.analysis import Advice, get_advice
+from src.batch import DEFAULT_WORKERS, FetchResult, SearchKey, request_key
+from src.currency import get_converter
+from src.flights import FlightRequest, get_parsed_flights
+from src.input import validate_row
+from src.output import json_default, render_report
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class LookupQueue:
+    """
+    Runs the flight lookups of all API calls on one pool of `max_workers` threads,
+    so the concurrency limit holds for the whole server. Identical searches that
+    are queued or running at the same time are done once.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self._pending: dict[SearchKey, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, request: FlightRequest) -> "Future[FetchResult]":
+        key = request_key(request)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(get_parsed_flights, request)
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._discard(key, done))
+        return future
+
+    def _discard(self, key: SearchKey, future: Future) -> None:
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def close(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+
+def to_row(data: dict[str, Any]) -> dict[str, Any]:
+    """
+    Maps the fields of a `FlightRequest` in JSON to the columns of the input sheet.
+    The currency may be given as its abbreviation or as a currency object.
+    """
+    currency = data.get("host_currency")
+    if isinstance(currency, dict):
+        currency = currency.get("abbreviation")
+    return_date = data.get("return_date")
+    return {
+        "Name": data.get("name", ""),
+        "Departure_Airport_Code": str(data.get("departure_airport", "")).upper(),
+        "Departure_Date": pandas.Timestamp(data.get("departure_date")),
+        "Arrival_Airport_Code": str(data.get("arrival_airport", "")).upper(),
+        "Return_Date": pandas.Timestamp(return_date) if return_date else pandas.NaT,
+        "Amount_Of_Passengers": data.get("family_size", 1),
+        "Home_Currency": currency,
+    }
+
+
+def parse_rows(body: Any) -> list[dict[str, Any]]:
+    if isinstance(body, dict) and "requests" in body:
+        body = body["requests"]
+    if isinstance(body, dict):
+        body = [body]
+    if not isinstance(body, list) or not all(isinstance(row, dict) for row in body):
+        raise ValueError(
+            "Expected a request object, a list of them, or {'requests': [...]}"
+        )
+    return body
+
+
+def advise(queue: LookupQueue, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Validates the rows, queues their searches and returns an entry per row, in
+    order, with either its advice or the reason there is none.
+    """
+    entries: list[dict[str, Any]] = []
+    pending: list[tuple[dict[str, Any], str, FlightRequest, Future]] = []
+    for data in rows:
+        entry: dict[str, Any] = {"name": str(data.get("name", ""))}
+        entries.append(entry)
+        try:
+            name, request = validate_row(to_row(data))
+        except ValidationError as e:
+            entry["error"] = "; ".join(error["msg"] for error in e.errors())
+            continue
+        except (ValueError, TypeError) as e:
+            entry["error"] = str(e)
+            continue
+        pending.append((entry, name, request, queue.submit(request)))
+
+    for entry, name, request, future in pending:
+        try:
+            flights, buying_time, avg_duration = future.result()
+            entry["advice"] = get_advice(
+                flights, "", name, request, buying_time, avg_duration, charts="typst"
+            )
+        except Exception as e:
+            entry["error"] = f"Could not fetch flights: {e!r}"
+    return entries
+
+
+def to_json(entry: dict[str, Any]) -> dict[str, Any]:
+    if "advice" in entry:
+        return dict(entry, advice=asdict(entry["advice"]))
+    return entry
+
+
+def make_handler(queue: LookupQueue) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        """
+        GET /health reports the provider metrics. POST /advice returns the advice of
+        every request as JSON, POST /report the report of all advices as a PDF.
+        """
+
+        def send_json(self, status: int, body: Any) -> None:
+            data = json.dumps(body, default=json_default).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def read_rows(self) -> list[dict[str, Any]] | None:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                self.send_json(413, {"error": "The request body is too large"})
+                return None
+            try:
+                return parse_rows(json.loads(self.rfile.read(length) or b"null"))
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return None
+
+        def do_GET(self) -> None:
+            if self.path != "/health":
+                self.send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            metrics = src.flights.provider_limiter.metrics
+            self.send_json(200, {"status": "ok", "provider": asdict(metrics)})
+
+        def do_POST(self) -> None:
+            if self.path not in ("/advice", "/report"):
+                self.send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            rows = self.read_rows()
+            if rows is None:
+                return
+            entries = advise(queue, rows)
+            if self.path == "/advice":
+                self.send_json(200, [to_json(entry) for entry in entries])
+                return
+            advices: list[Advice] = [e["advice"] for e in entries if "advice" in e]
+            if not advices:
+                self.send_json(422, [to_json(entry) for entry in entries])
+                return
+            pdf = render_report(advices)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(pdf)))
+            self.end_headers()
+            self.wfile.write(pdf)
+
+    return Handler
+
+
+def warm_up() -> None:
+    """
+    Loads the airports and exchange rates before the first call needs them.
+    """
+    len(airports)
+    get_converter()
+
+
+def make_server(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    max_workers: int = DEFAULT_WORKERS,
+) -> tuple[ThreadingHTTPServer, LookupQueue]:
+    queue = LookupQueue(max_workers)
+    return ThreadingHTTPServer((host, port), make_handler(queue)), queue
+
+
+def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    max_workers: int = DEFAULT_WORKERS,
+) -> None:
+    warm_up()
+    server, queue = make_server(host, port, max_workers)
+    print(f"Serving on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.close()
@@ -0,0 +1,57 @@
+// Scatter plot of all flights with the Pareto front, drawn without images.
+// `plot` has the arrays `minutes`, `prices`, `pareto_minutes` and `pareto_prices`.
+
+#let ticks(low, high, count: 5) = range(count).map(i => low + (high - low) * i / (count - 1))
+
+#let scatter-plot(plot, width: 15cm, height: 9cm) = {
+  let xs = plot.minutes
+  let ys = plot.prices
+  if xs.len() == 0 {
+    return [_No flights to plot._]
+  }
+  let x-min = calc.min(..xs)
+  let x-max = calc.max(..xs)
+  let y-min = calc.min(..ys)
+  let y-max = calc.max(..ys)
+  let x-span = calc.max(x-max - x-min, 1)
+  let y-span = calc.max(y-max - y-min, 1)
+
+  let left = 1.6cm
+  let bottom = 1.2cm
+  let plot-width = width - left
+  let plot-height = height - bottom
+  let px(x) = left + plot-width * ((x - x-min) / x-span)
+  let py(y) = plot-height * (1 - (y - y-min) / y-span)
+
+  pad(top: 14pt, box(width: width, height: height, {
+    // grid and tick labels
+    for x in ticks(x-min, x-max) {
+      place(line(start: (px(x), 0pt), end: (px(x), plot-height), stroke: 0.4pt + luma(220)))
+      place(dx: px(x) - 0.5cm, dy: plot-height + 4pt, box(width: 1cm, align(center, text(size: 7pt, str(calc.round(x))))))
+    }
+    for y in ticks(y-min, y-max) {
+      place(line(start: (left, py(y)), end: (width, py(y)), stroke: 0.4pt + luma(220)))
+      place(dx: 0pt, dy: py(y) - 4pt, box(width: left - 4pt, align(right, text(size: 7pt, str(calc.round(y))))))
+    }
+    // axes
+    place(line(start: (left, 0pt), end: (left, plot-height), stroke: 0.6pt))
+    place(line(start: (left, plot-height), end: (width, plot-height), stroke: 0.6pt))
+    place(dx: left, dy: height - 9pt, box(width: plot-width, align(center, text(size: 8pt)[Duration (minutes)])))
+    place(dx: 0pt, dy: -12pt, text(size: 8pt)[Price (€)])
+
+    // all flights
+    for (x, y) in xs.zip(ys) {
+      place(dx: px(x) - 1.8pt, dy: py(y) - 1.8pt, circle(radius: 1.8pt, fill: luma(200), stroke: none))
+    }
+    // best flights, connected from short to long
+    let front = plot.pareto_minutes.zip(plot.pareto_prices)
+    for i in range(calc.max(front.len() - 1, 0)) {
+      let (x0, y0) = front.at(i)
+      let (x1, y1) = front.at(i + 1)
+      place(line(start: (px(x0), py(y0)), end: (px(x1), py(y1)), stroke: (paint: red.transparentize(50%), thickness: 0.8pt, dash: "dashed")))
+    }
+    for (x, y) in front {
+      place(dx: px(x) - 2.2pt, dy: py(y) - 2.2pt, circle(radius: 2.2pt, fill: red, stroke: none))
+    }
+  }))
+}
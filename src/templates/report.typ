@@ -1,3 +1,5 @@
+#import "plot.typ": scatter-plot
+
 = Home Leave Allowance Report
 
 _Generated on #datetime.today().display("[year]-[month]-[day]")._
@@ -15,9 +17,17 @@ For all plots, the grey dots represent possible flights. On the horizontal axis,
   They leave on the *#advice.departure_date_str* #if advice.return_date_str != none [and return on the *#advice.return_date_str*].
   Since the average time for this flight is #if long_duration [over] else [under] 5 hours, the flights listed are *#if long_duration [business] else [economy] class* flights.
   At the time of generating this report, the prices are *#advice.buying_time*.
+  #let routes = advice.at("routes", default: none)
+  #if routes != none and routes.len() > 1 [
+    Flights from and to nearby airports are included, on the routes #routes.map(route => [*#route*]).join(", ", last: " and ").
+  ]
 
   #figure(
-    image(advice.pareto_path, width: 100%),
+    if advice.at("plot", default: none) != none {
+      scatter-plot(advice.plot)
+    } else {
+      image(advice.pareto_path, width: 100%)
+    },
     caption: [Best flights for #advice.name]
   )
   
@@ -40,6 +50,32 @@ For all plots, the grey dots represent possible flights. On the horizontal axis,
       }
     )
   }
+
+  #let matrix = advice.at("date_matrix", default: none)
+  #if matrix != none [
+    === Cheapest price per date (€)
+
+    #let prices = matrix.prices.flatten().filter(p => p != none)
+    #let cheapest = if prices.len() > 0 { calc.min(..prices) }
+    #let cell(price) = if price == none [–] else if price == cheapest [*#price*] else [#price]
+    #if matrix.return_dates.at(0) == none {
+      table(
+        columns: 2,
+        table.header[Departure][Price (€)],
+        ..for (date, row) in matrix.departure_dates.zip(matrix.prices) {
+          (date, cell(row.at(0)))
+        }
+      )
+    } else {
+      text(size: 8pt, table(
+        columns: matrix.return_dates.len() + 1,
+        table.header([Departure / Return], ..matrix.return_dates.map(date => [#date])),
+        ..for (date, row) in matrix.departure_dates.zip(matrix.prices) {
+          ([#date], ..row.map(cell))
+        }
+      ))
+    }
+  ]
 ]
 
 #let advices = json("advices.json")
@@ -11,3 +11,8 @@ def get_template_dir() -> str:
         template_dir = os.path.join(os.path.dirname(__file__), "templates")
 
     return template_dir
+
+
+def get_cache_path():
+    # Cross-platform cache dir (use appdirs if you want)
+    return os.path.join(os.path.expanduser("~"), ".cache", "hla_tool")
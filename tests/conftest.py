@@ -0,0 +1,74 @@
+import datetime
+
+import pendulum
+import pytest
+from fast_flights import Flight, Result
+
+import src.cache
+import src.currency
+import src.flights
+import src.history
+import src.journal
+from src.cache import RouteDurationIndex, SearchCache
+from src.currency import RateTable
+from src.flights import FlightBatch
+from src.history import PriceHistory
+
+RATES = RateTable(
+    rates={
+        "USD": {datetime.date(2025, 7, 11): 1.1684},
+        "JPY": {datetime.date(2025, 7, 11): 172.21},
+        "GBP": {datetime.date(2025, 7, 11): 0.8667},
+    },
+    last_date=datetime.date(2025, 7, 11),
+)
+"""A few exchange rates, so tests do not download the ECB history."""
+
+
+def make_batch(prices: list[float], airline: str = "KLM") -> FlightBatch:
+    """Nonstop flights from AMS to JFK on July 13th 2030, ten minutes apart in duration."""
+    start = pendulum.datetime(2030, 7, 13, 10).int_timestamp
+    return FlightBatch.from_columns(
+        [airline] * len(prices),
+        [start] * len(prices),
+        [start + 8 * 3600 + i * 600 for i in range(len(prices))],
+        [0] * len(prices),
+        prices,
+        ["Europe/Amsterdam"] * len(prices),
+        ["America/New_York"] * len(prices),
+    )
+
+
+def make_result(price: str) -> Result:
+    """A search result with a single KLM flight for `price`."""
+    flight = Flight(
+        is_best=True,
+        name="KLM",
+        departure="10:30 AM on Sun, Jul 13",
+        arrival="6:05 PM on Sun, Jul 13",
+        arrival_time_ahead="",
+        duration="8 hr 35 min",
+        stops=0,
+        delay=None,
+        price=price,
+    )
+    return Result(current_price="typical", flights=[flight])  # type: ignore
+
+
+@pytest.fixture(autouse=True)
+def offline(tmp_path, monkeypatch):
+    """
+    Keeps every test away from the real cache directory and the ECB: caches, the
+    journal and the price history are written to `tmp_path`, and the exchange rates
+    are `RATES`.
+    """
+    cache_path = str(tmp_path / "cache")
+    for module in [src.currency, src.cache, src.history, src.journal]:
+        monkeypatch.setattr(module, "get_cache_path", lambda: cache_path)
+    monkeypatch.setattr(src.flights, "search_cache", SearchCache())
+    monkeypatch.setattr(src.flights, "route_durations", RouteDurationIndex())
+    monkeypatch.setattr(src.flights, "price_history", PriceHistory())
+    monkeypatch.setattr(src.currency, "_converter", RATES)
+    src.flights.get_currency.cache_clear()
+    yield
+    src.flights.get_currency.cache_clear()
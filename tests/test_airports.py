@@ -0,0 +1,61 @@
+import numpy as np
+
+from src.airports import AirportIndex, read_airports_csv, read_snapshot
+
+
+def test_snapshot_matches_csv():
+    snapshot = read_snapshot()
+    columns = read_airports_csv()
+    assert snapshot is not None, "Run `python -m src.airports` to build the snapshot"
+    assert snapshot.keys() == columns.keys()
+    for column in columns:
+        assert np.array_equal(snapshot[column], columns[column]), column
+
+
+def test_airport_index_lookup():
+    index = AirportIndex()
+    assert "ams" in index
+    assert "XXX" not in index
+    amsterdam = index.get("AMS")
+    assert amsterdam is not None
+    assert amsterdam.tz == "Europe/Amsterdam"
+    assert round(amsterdam.lat) == 52
+    assert index.get("") is None
+    assert len(index) > 7000
+
+
+def test_nearby_matches_brute_force():
+    index = AirportIndex()
+    columns = index.columns
+    lat, lon = np.radians(columns["lat"]), np.radians(columns["lon"])
+    rng = np.random.default_rng(0)
+    for code in ["AMS", "JFK", "SYD", "SVO", "GRU"] + list(
+        rng.choice(columns["iata"], 20)
+    ):
+        i = columns["iata"].index(code)
+        a = (
+            np.sin((lat - lat[i]) / 2) ** 2
+            + np.cos(lat[i]) * np.cos(lat) * np.sin((lon - lon[i]) / 2) ** 2
+        )
+        distances = 2 * 6371.0 * np.arcsin(np.sqrt(a))
+        expected = {columns["iata"][j] for j in np.flatnonzero(distances <= 250)}
+        found = index.nearby(code, 250)
+        assert {record.iata for record, _ in found} == expected - {code}
+        assert [d for _, d in found] == sorted(d for _, d in found)
+
+
+def test_nearby_airports():
+    index = AirportIndex()
+    nearby = {record.iata: distance for record, distance in index.nearby("JFK", 50)}
+    assert {"LGA", "EWR"} <= nearby.keys()
+    assert 30 < nearby["EWR"] < 40
+    assert index.nearby("AMS", 10) == []
+
+
+def test_search_by_name_and_city():
+    index = AirportIndex()
+    assert index.search("ams")[0].iata == "AMS"
+    assert index.search("amsterdam")[0].iata == "AMS"
+    assert index.search("Los Angeles")[0].iata == "LAX"
+    assert "LHR" in [record.iata for record in index.search("heathrow")]
+    assert index.search("nowhere at all") == []
@@ -8,18 +8,20 @@ from src.analysis import (
     biased_prices,
     get_advice,
     iqr_filter,
+    is_dominated,
+    pareto_mask,
+    pareto_mask_nd,
     round_with_margins,
 )
-from src.flights import ParsedFlight
+from src.flights import Currency, FlightRequest, ParsedFlight
 
 
 def load_flights_from_json(filename: str) -> list[ParsedFlight]:
-    file_path = Path.cwd() / "tests" / "data" / filename
+    file_path = Path(__file__).parent / "data" / filename
     with file_path.open("r") as f:
         data = json.load(f)
     return [
         ParsedFlight(
-            is_best=entry["is_best"],
             name=entry["name"],
             departure=pendulum.parse(entry["departure"]),  # type: ignore
             arrival=pendulum.parse(entry["arrival"]),  # type: ignore
@@ -31,14 +33,25 @@ def load_flights_from_json(filename: str) -> list[ParsedFlight]:
 
 
 flights = load_flights_from_json("one_way_flights.json")
+request = FlightRequest(
+    departure_airport="AMS",
+    arrival_airport="LAX",
+    family_size=4,
+    host_currency=Currency("Euro", "€", "EUR"),
+    departure_date=pendulum.date(2025, 7, 14),
+    return_date=None,
+)
 
 
-def test_get_average_price():
-    price, minutes = get_advice(flights)
-    print(f"Price: {price}")
-    print(f"Duration: {int(minutes/60)} hours and {minutes % 60} minutes")
-    assert price >= 0
-    assert minutes >= 0
+def test_get_advice():
+    advice = get_advice(
+        flights, "plot.png", "mario", request, "typical", 11, charts="typst"
+    )
+    assert advice.name == "Mario"
+    assert len(advice.pareto_flights) > 0
+    for flight in advice.pareto_flights:
+        assert flight.price >= 0
+        assert flight.rounded_price >= flight.price
 
 
 def test_get_rounded_price():
@@ -59,6 +72,43 @@ def test_iqr():
     iqr_mask = iqr_filter(prices)
     avg = np.mean(prices[iqr_mask])
     print(f"IQR average: {avg}")
-    print(f"Mean: {get_advice(flights)}")
     print(f"Biased mean: {np.mean(prices)}")
     assert avg >= 0
+
+
+def test_pareto_mask_matches_is_dominated():
+    rng = np.random.default_rng(42)
+    for size in [0, 1, 2, 10, 200]:
+        # small value ranges to get many ties
+        prices = rng.integers(0, 20, size).astype(float)
+        durations = rng.integers(0, 20, size)
+        expected = [not is_dominated(i, prices, durations) for i in range(size)]
+        assert pareto_mask(prices, durations).tolist() == expected
+
+
+def test_pareto_mask_nd():
+    rng = np.random.default_rng(7)
+    points = rng.integers(0, 5, (300, 3))
+    expected = [
+        not any(np.all(other <= point) and np.any(other < point) for other in points)
+        for point in points
+    ]
+    assert pareto_mask_nd(points).tolist() == expected
+
+    prices = points[:, 0].astype(float)
+    durations = points[:, 1]
+    assert (
+        pareto_mask_nd(points[:, :2]).tolist()
+        == pareto_mask(prices, durations).tolist()
+    )
+
+
+def test_get_advice_with_typst_charts():
+    advice = get_advice(
+        flights, "plot.png", "mario", request, "typical", 11, charts="typst"
+    )
+    assert advice.pareto_path is None
+    assert advice.plot is not None
+    assert len(advice.plot.minutes) == len(advice.plot.prices) > 0
+    assert advice.plot.pareto_minutes == sorted(advice.plot.pareto_minutes)
+    assert len(advice.pareto_flights) > 0
@@ -0,0 +1,85 @@
+import threading
+import time
+from dataclasses import replace
+
+import pendulum
+
+import src.batch
+from src.batch import fetch_requests, plan_searches
+from src.flights import Currency, FlightRequest
+
+currency = Currency(name="Euro", symbol="€", abbreviation="EUR")
+
+
+def make_request(arrival_airport: str) -> FlightRequest:
+    return FlightRequest(
+        departure_airport="AMS",
+        arrival_airport=arrival_airport,
+        family_size=1,
+        host_currency=currency,
+        departure_date=pendulum.today().date().add(days=30),
+        return_date=None,
+    )
+
+
+def test_fetch_requests_keeps_order_and_skips_failures(monkeypatch):
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def fake_get_parsed_flights(request: FlightRequest):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        # later rows finish first
+        time.sleep(0.05 if request.arrival_airport == "JFK" else 0.01)
+        with lock:
+            running -= 1
+        if request.arrival_airport == "BAD":
+            raise RuntimeError("No flights found")
+        return [], request.arrival_airport, 1.0
+
+    monkeypatch.setattr(src.batch, "get_parsed_flights", fake_get_parsed_flights)
+    requests = [
+        ("A", make_request("JFK")),
+        ("Error", None),
+        ("B", make_request("BAD")),
+        ("C", make_request("LHR")),
+        ("D", make_request("BKK")),
+    ]
+
+    results = list(fetch_requests(requests, max_workers=2))
+
+    assert [i for i, _, _, _ in results] == [0, 2, 3, 4]
+    assert results[1][3] is None
+    assert [r[3][1] for r in results if r[3] is not None] == ["JFK", "LHR", "BKK"]
+    assert max_running <= 2
+
+
+def test_identical_searches_are_fetched_once(monkeypatch):
+    searched = []
+
+    def fake_get_parsed_flights(request: FlightRequest):
+        searched.append(request.arrival_airport)
+        return [], "typical", 1.0
+
+    monkeypatch.setattr(src.batch, "get_parsed_flights", fake_get_parsed_flights)
+    euro_request = make_request("JFK")
+    dollar_request = replace(
+        make_request("JFK"), host_currency=Currency("US Dollar", "$", "USD")
+    )
+    requests = [
+        ("A", euro_request),
+        ("B", make_request("LHR")),
+        ("C", dollar_request),
+        ("D", make_request("JFK")),
+    ]
+
+    plan = plan_searches(requests)
+    results = list(fetch_requests(requests))
+
+    assert plan.saved_searches == 2
+    assert sorted(searched) == ["JFK", "LHR"]
+    assert [request for _, _, request, _ in results] == [r for _, r in requests]
+    assert results[0][3] is results[2][3] is results[3][3]
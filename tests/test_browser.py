@@ -0,0 +1,116 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.browser import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, browser: "FakeBrowser"):
+        self.browser = browser
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts: list[FakeContext] = []
+        self.closed = False
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def new_context(self) -> FakeContext:
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeLauncher:
+    def __init__(self):
+        self.browsers: list[FakeBrowser] = []
+        self.stopped = 0
+
+    async def __call__(self):
+        browser = FakeBrowser()
+        self.browsers.append(browser)
+        return browser, self.stop
+
+    async def stop(self):
+        self.stopped += 1
+
+
+async def use(context: FakeContext) -> FakeContext:
+    return context
+
+
+def test_contexts_are_reused_and_recycled():
+    launcher = FakeLauncher()
+    with BrowserPool(1, max_uses=3, launch=launcher) as pool:
+        contexts = [pool.run(use) for _ in range(7)]
+    assert len(launcher.browsers) == 1
+    browser = launcher.browsers[0]
+    assert contexts[:3] == [browser.contexts[0]] * 3
+    assert len(browser.contexts) == 3
+    assert all(context.closed for context in browser.contexts)
+    assert browser.closed
+    assert launcher.stopped == 1
+
+
+def test_failed_task_replaces_context():
+    launcher = FakeLauncher()
+
+    async def fail(context):
+        raise RuntimeError("page crashed")
+
+    with BrowserPool(1, launch=launcher) as pool:
+        first = pool.run(use)
+        with pytest.raises(RuntimeError):
+            pool.run(fail)
+        assert first.closed
+        assert pool.run(use) is not first
+
+
+def test_crashed_browser_is_restarted():
+    launcher = FakeLauncher()
+    with BrowserPool(1, max_uses=1, launch=launcher) as pool:
+        pool.run(use)
+        launcher.browsers[0].connected = False
+        context = pool.run(use)
+    assert len(launcher.browsers) == 2
+    assert context.browser is launcher.browsers[1]
+    assert launcher.stopped == 2
+
+
+def test_pool_limits_concurrent_tasks():
+    launcher = FakeLauncher()
+    running = 0
+    most = 0
+
+    async def slow(context):
+        nonlocal running, most
+        running += 1
+        most = max(most, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return context
+
+    with BrowserPool(2, launch=launcher) as pool:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            contexts = list(executor.map(lambda _: pool.run(slow), range(20)))
+    assert most == 2
+    assert len(set(map(id, contexts))) == 2
+
+
+def test_unused_pool_starts_nothing():
+    launcher = FakeLauncher()
+    with BrowserPool(4, launch=launcher):
+        pass
+    assert launcher.browsers == []
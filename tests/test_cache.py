@@ -0,0 +1,84 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fast_flights import FlightData, Passengers
+
+from src.cache import RouteDurationIndex, SearchCache, search_key
+from tests.conftest import make_result
+
+
+def make_key(date: str) -> str:
+    flight_data = FlightData(date=date, from_airport="AMS", to_airport="JFK")
+    return search_key([flight_data], "one-way", "economy", Passengers(adults=2))
+
+
+def test_search_key_depends_on_search():
+    assert make_key("2025-07-13") == make_key("2025-07-13")
+    assert make_key("2025-07-13") != make_key("2025-07-14")
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.sqlite3"))
+    key = make_key("2025-07-13")
+    assert cache.get(key) is None
+    cache.put(key, make_result("€450"))
+    assert cache.get(key) == make_result("€450")
+
+
+def test_cache_ttl(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.sqlite3"), ttl_hours=0.1 / 3600)
+    key = make_key("2025-07-13")
+    cache.put(key, make_result("€450"))
+    time.sleep(0.2)
+    assert cache.get(key) is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    keys = [make_key(f"2025-07-1{i}") for i in range(3)]
+    cache.put(keys[0], make_result("€1"))
+    cache.put(keys[1], make_result("€2"))
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], make_result("€3"))
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_cache_modes(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.sqlite3"), mode="refresh")
+    key = make_key("2025-07-13")
+    cache.put(key, make_result("€450"))
+    assert cache.get(key) is None
+    cache.mode = "bypass"
+    cache.put(key, make_result("€500"))
+    cache.mode = "use"
+    assert cache.get(key) == make_result("€450")
+
+
+def test_route_duration_index_probes_once(tmp_path):
+    path = str(tmp_path / "route_durations.json")
+    index = RouteDurationIndex(path)
+    calls = []
+
+    def probe() -> int:
+        calls.append(1)
+        time.sleep(0.05)
+        return 8
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        durations = list(
+            executor.map(lambda _: index.get_or_compute("ams", "JFK", probe), range(16))
+        )
+
+    assert durations == [8] * 16
+    assert len(calls) == 1
+    assert RouteDurationIndex(path).get("AMS", "JFK") == 8
+
+
+def test_route_duration_index_does_not_remember_none(tmp_path):
+    path = str(tmp_path / "route_durations.json")
+    index = RouteDurationIndex(path)
+    assert index.get_or_compute("AMS", "NBO", lambda: None) is None
+    assert index.get_or_compute("AMS", "NBO", lambda: 9) == 9
+    assert RouteDurationIndex(path).get("AMS", "NBO") == 9
@@ -0,0 +1,140 @@
+import datetime
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+import src.currency
+import src.flights
+from src.currency import RateTable, load_rate_table, refresh_file
+from src.flights import get_currency, parse_currency
+
+RATES_CSV = """Date,USD,JPY,HRK,
+2025-07-11,1.1684,172.21,N/A,
+2025-07-10,1.1700,171.50,N/A,
+2025-07-09,1.1721,171.63,N/A,
+2022-12-30,1.0666,140.66,7.5365,
+"""
+
+
+@pytest.fixture
+def currency_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.currency, "get_cache_path", lambda: str(tmp_path))
+    path = tmp_path / "eurofxref-hist.csv"
+    path.write_text(RATES_CSV)
+    return str(path)
+
+
+def test_rate_table_converts_like_currency_converter(currency_file):
+    table = load_rate_table(currency_file)
+    assert table.currencies == {"EUR", "USD", "JPY", "HRK"}
+    assert table.last_date == datetime.date(2025, 7, 11)
+    assert table.convert(100, "EUR", "USD") == pytest.approx(116.84)
+    assert table.convert(116.84, "USD") == pytest.approx(100)
+    assert table.convert(100, "USD", "JPY", datetime.date(2025, 7, 9)) == pytest.approx(
+        100 / 1.1721 * 171.63
+    )
+    # currencies that are no longer published keep their last known rate
+    assert table.rate("HRK") == pytest.approx(7.5365)
+    with pytest.raises(ValueError):
+        table.convert(100, "EUR", "XYZ")
+
+
+def test_convert_array_matches_convert(currency_file):
+    table = load_rate_table(currency_file)
+    amounts = np.array([100, 250, 1000])
+    converted = table.convert_array(amounts, "EUR", "JPY")
+    assert converted == pytest.approx([table.convert(a, "EUR", "JPY") for a in amounts])
+    date = datetime.date(2025, 7, 12)
+    assert table.convert_array(amounts, "USD", date=date) == pytest.approx(
+        amounts / 1.1684
+    )
+    assert ("USD", date) in table._resolved
+
+
+def test_currencies_are_memoized(currency_file, monkeypatch):
+    table = load_rate_table(currency_file)
+    monkeypatch.setattr(src.flights, "get_converter", lambda: table)
+    get_currency.cache_clear()
+    usd = parse_currency("usd")
+    assert usd.symbol == "$"
+    assert parse_currency("USD") is usd
+    assert get_currency.cache_info().misses == 1
+    with pytest.raises(ValueError):
+        parse_currency("XYZ")
+    get_currency.cache_clear()
+
+
+def test_rate_table_snapshot_is_reused(currency_file, monkeypatch):
+    table = load_rate_table(currency_file)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the history should not be parsed again")
+
+    monkeypatch.setattr(src.currency, "CurrencyConverter", fail)
+    assert load_rate_table(currency_file) == table
+    assert RateTable.from_json(table.to_json()) == table
+
+
+class FakeECBHandler(BaseHTTPRequestHandler):
+    body = b"version 1"
+    etag = '"v1"'
+    requests: list[dict[str, str]] = []
+
+    def do_GET(self):
+        FakeECBHandler.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == FakeECBHandler.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", FakeECBHandler.etag)
+        self.send_header("Content-Length", str(len(FakeECBHandler.body)))
+        self.end_headers()
+        self.wfile.write(FakeECBHandler.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ecb_url():
+    FakeECBHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeECBHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/eurofxref-hist.zip"
+    server.shutdown()
+
+
+def test_refresh_file_is_conditional(tmp_path, ecb_url):
+    path = str(tmp_path / "eurofxref-hist.zip")
+
+    assert refresh_file(ecb_url, path, max_age_hours=24)
+    assert open(path, "rb").read() == b"version 1"
+
+    # fresh enough, no request at all
+    assert not refresh_file(ecb_url, path, max_age_hours=24)
+    assert len(FakeECBHandler.requests) == 1
+
+    # too old, but not modified
+    assert not refresh_file(ecb_url, path, max_age_hours=0)
+    assert FakeECBHandler.requests[-1]["If-None-Match"] == '"v1"'
+    assert open(path, "rb").read() == b"version 1"
+
+    FakeECBHandler.body, FakeECBHandler.etag = b"version 2", '"v2"'
+    assert refresh_file(ecb_url, path, max_age_hours=0)
+    assert open(path, "rb").read() == b"version 2"
+    assert sorted(os.listdir(tmp_path)) == [
+        "eurofxref-hist.zip",
+        "eurofxref-hist.zip.json",
+    ]
+
+
+def test_refresh_file_keeps_stale_copy_when_offline(tmp_path):
+    path = tmp_path / "eurofxref-hist.zip"
+    path.write_bytes(b"stale")
+    assert not refresh_file("http://127.0.0.1:9/unreachable", str(path), 0)
+    assert path.read_bytes() == b"stale"
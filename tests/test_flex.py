@@ -0,0 +1,93 @@
+import numpy as np
+import pendulum
+
+import src.batch
+from src.analysis import cheapest_per_cell
+from src.flex import expand_request, fetch_grids, get_grid_advice
+from src.flights import Currency, FlightBatch, FlightRequest
+from tests.conftest import make_batch
+
+today = pendulum.date(2030, 7, 1)
+
+
+def make_request(departure: int, return_: int | None) -> FlightRequest:
+    return FlightRequest(
+        departure_airport="AMS",
+        arrival_airport="JFK",
+        family_size=2,
+        host_currency=Currency("Euro", "€", "EUR"),
+        departure_date=pendulum.date(2030, 7, departure),
+        return_date=pendulum.date(2030, 7, return_) if return_ else None,
+    )
+
+
+def test_expand_round_trip():
+    grid = expand_request(make_request(13, 20), 2, today)
+    assert grid.shape == (5, 5)
+    assert len(grid.cells) == 25
+    assert grid.departure_dates[0] == pendulum.date(2030, 7, 11)
+    assert grid.return_dates[-1] == pendulum.date(2030, 7, 22)
+
+
+def test_expand_skips_past_and_reversed_dates():
+    grid = expand_request(make_request(2, 4), 2, today)
+    searched = {(r.departure_date.day, r.return_date.day) for _, _, r in grid.cells}
+    assert all(departure >= 1 for departure, _ in searched)
+    assert all(departure <= return_ for departure, return_ in searched)
+    assert (4, 2) not in searched
+
+    one_way = expand_request(make_request(13, None), 1, today)
+    assert one_way.shape == (3, 1)
+
+
+def test_concat_remaps_categories():
+    batch = FlightBatch.concat([make_batch([100, 200]), make_batch([300], "Delta")])
+    assert len(batch) == 3
+    assert [flight.name for flight in batch] == ["KLM", "KLM", "Delta"]
+    assert batch.price.tolist() == [100, 200, 300]
+    assert batch[2].arrival.timezone_name == "America/New_York"
+
+
+def test_cheapest_per_cell():
+    cheapest = cheapest_per_cell(
+        np.array([300.0, 200.0, 500.0]), np.array([0, 0, 3]), (2, 2)
+    )
+    assert cheapest[0, 0] == 200
+    assert cheapest[1, 1] == 500
+    assert np.isnan(cheapest[0, 1])
+
+
+def test_grid_advice_has_cheapest_matrix():
+    request = make_request(13, None)
+    grid = expand_request(request, 1, today)
+    results = [
+        None,
+        (make_batch([400, 410, 420]), "low", 8),
+        (make_batch([500, 510, 520]), "high", 8),
+    ]
+    advice = get_grid_advice(grid, results, "plot.png", "mario", request, None, "typst")
+    assert advice is not None
+    # the buying advice of the requested date
+    assert advice.buying_time == "low"
+    assert advice.date_matrix is not None
+    assert advice.date_matrix.prices == [[None], [400], [500]]
+
+
+def test_fetch_grids_shares_searches(monkeypatch):
+    searched = []
+
+    def fake_search(request):
+        searched.append(request.departure_date)
+        return make_batch([100 + request.departure_date.day]), "typical", 8
+
+    monkeypatch.setattr(src.batch, "get_parsed_flights", fake_search)
+    requests = [
+        ("mario", make_request(13, None)),
+        ("invalid", None),
+        ("luigi", make_request(14, None)),
+    ]
+    rows = list(fetch_grids(requests, 1, max_workers=2))
+    assert [(i, name) for i, name, *_ in rows] == [(0, "mario"), (2, "luigi")]
+    assert [len(results) for *_, results in rows] == [3, 3]
+    # the 13th and 14th are in both grids, but only searched once
+    assert sorted(date.day for date in searched) == [12, 13, 14, 15]
@@ -3,19 +3,29 @@ from dataclasses import asdict
 from pathlib import Path
 
 import pendulum
+import pytest
+from fast_flights import Result
 
+import src.flights
+from src.cache import RouteDurationIndex
 from src.flights import (
+    Currency,
+    FlightBatch,
     FlightRequest,
     ParsedFlight,
+    estimate_flight_duration,
     get_airport_code,
     get_direct_flight_duration,
     get_parsed_flights,
-    parse_currency,
+    parse_flight_time,
+    parse_flight_timestamp,
+    probe_direct_flight_duration,
 )
+from src.provider import ProviderThrottled
 
 departure_airport = get_airport_code("amsterdam")
 arrival_airport = get_airport_code("los angeles")
-currency = parse_currency("USD")
+currency = Currency("US Dollar", "$", "USD")
 family_size = 4
 
 
@@ -78,3 +88,109 @@ def test_calculate_flight_cost_round_trip():
     result = get_parsed_flights(sample_request)
     save_flights_to_json(result, "round_trip_flights.json")
     assert result is not None
+
+
+def test_estimate_flight_duration():
+    assert estimate_flight_duration("AMS", "AMS") == 0
+    assert estimate_flight_duration("AMS", "LHR") == 1
+    assert 7 <= estimate_flight_duration("AMS", "JFK") <= 9
+
+
+def test_route_without_direct_flight_is_estimated(tmp_path, monkeypatch):
+    def no_flights(*args, **kwargs):
+        return Result(current_price="", flights=[])
+
+    monkeypatch.setattr(src.flights, "search_flights", no_flights)
+    monkeypatch.setattr(
+        src.flights,
+        "route_durations",
+        RouteDurationIndex(str(tmp_path / "route_durations.json")),
+    )
+    sample_request = FlightRequest(
+        departure_airport="AMS",
+        arrival_airport="NBO",
+        family_size=1,
+        host_currency=currency,
+        departure_date=pendulum.now() + pendulum.duration(days=30),
+        return_date=None,
+    )
+    assert probe_direct_flight_duration(sample_request) is None
+    assert get_direct_flight_duration(sample_request) == estimate_flight_duration(
+        "AMS", "NBO"
+    )
+    # the estimate is not remembered
+    assert src.flights.route_durations.get("AMS", "NBO") is None
+
+
+def test_probe_errors_are_raised(monkeypatch):
+    def blocked(*args, **kwargs):
+        raise ProviderThrottled("429 Too Many Requests")
+
+    monkeypatch.setattr(src.flights, "search_flights", blocked)
+    sample_request = FlightRequest(
+        departure_airport="AMS",
+        arrival_airport="NBO",
+        family_size=1,
+        host_currency=currency,
+        departure_date=pendulum.now() + pendulum.duration(days=30),
+        return_date=None,
+    )
+    with pytest.raises(ProviderThrottled):
+        probe_direct_flight_duration(sample_request)
+
+
+def test_flight_batch_roundtrip():
+    flights = [
+        ParsedFlight(
+            name=name,
+            departure=pendulum.datetime(2025, 7, 13, 10, 30, tz="Europe/Amsterdam"),
+            arrival=pendulum.datetime(2025, 7, 13, 12, 45 + i, tz="America/New_York"),
+            stops=i,
+            price=400.0 + i,
+        )
+        for i, name in enumerate(["KLM", "Delta", "KLM"])
+    ]
+    batch = FlightBatch.from_parsed(flights)
+
+    assert len(batch) == 3
+    assert batch.airlines == ["KLM", "Delta"]
+    assert batch.minutes.tolist() == [495, 496, 497]
+    assert batch.flights == flights
+    assert list(batch) == flights
+    assert len(FlightBatch()) == 0
+
+
+def test_parse_flight_time_matches_format_string():
+    reference = pendulum.date(2025, 7, 1)
+    for time_str in [
+        "10:30 AM on Sun, Jul 13",
+        "12:05 AM on Sun, Jul 13",
+        "12:05 PM on Sun, Jul 13",
+        "2:30 AM on Sun, Mar 30",
+        "2:30 AM on Sun, Oct 26",
+    ]:
+        expected = pendulum.from_format(
+            time_str.replace("on ", "") + " 2025",
+            "h:mm A ddd, MMM D YYYY",
+            tz="Europe/Amsterdam",
+        )
+        assert parse_flight_time(time_str, "Europe/Amsterdam", reference) == expected
+        assert (
+            parse_flight_timestamp(time_str, "Europe/Amsterdam", reference)
+            == expected.int_timestamp
+        )
+
+
+def test_parse_flight_time_across_new_year():
+    reference = pendulum.date(2025, 12, 30)
+    parsed = parse_flight_time("1:00 AM on Fri, Jan 2", "Asia/Tokyo", reference)
+    assert parsed == pendulum.datetime(2026, 1, 2, 1, 0, tz="Asia/Tokyo")
+    parsed = parse_flight_time("11:55 PM on Sat, Dec 27", "Asia/Tokyo", reference)
+    assert parsed == pendulum.datetime(2025, 12, 27, 23, 55, tz="Asia/Tokyo")
+
+
+def test_parse_flight_timestamp_days_ahead():
+    reference = pendulum.date(2025, 7, 1)
+    same_day = parse_flight_timestamp("6:05 AM on Mon, Jul 14", "UTC", reference)
+    next_day = parse_flight_timestamp("6:05 AM on Mon, Jul 14", "UTC", reference, 1)
+    assert next_day - same_day == 24 * 3600
@@ -0,0 +1,142 @@
+import sqlite3
+import time
+from contextlib import closing
+
+import numpy as np
+import pendulum
+
+import src.flights
+from src.flights import (
+    Currency,
+    FlightBatch,
+    FlightRequest,
+    get_parsed_flights,
+)
+from src.history import FIELDS, PriceHistory
+from tests.conftest import make_batch
+
+july = pendulum.date(2030, 7, 13)
+
+
+def make_key(
+    day: int = 13,
+    origin: str = "AMS",
+    destination: str = "NBO",
+    return_day: int | None = None,
+    passengers: int = 2,
+):
+    return_date = pendulum.date(2030, 7, return_day) if return_day else None
+    return (origin, destination, pendulum.date(2030, 7, day), return_date, passengers)
+
+
+def test_latest_roundtrip(tmp_path):
+    history = PriceHistory(str(tmp_path / "history.sqlite3"), max_age_hours=6)
+    assert history.latest(make_key()) is None
+    batch = make_batch([400, 500, 600])
+    history.add(make_key(), batch, "low", 8)
+    stored = history.latest(make_key())
+    assert stored is not None
+    assert stored.buying_time == "low"
+    restored = FlightBatch(**stored.columns)
+    assert [flight.name for flight in restored] == ["KLM"] * 3
+    assert restored.price.tolist() == [400, 500, 600]
+    assert restored[0].arrival.timezone_name == "America/New_York"
+    assert history.latest(make_key(14)) is None
+
+
+def test_latest_respects_max_age(tmp_path):
+    history = PriceHistory(str(tmp_path / "history.sqlite3"), max_age_hours=6)
+    history.add(make_key(), make_batch([400]), "low", 8, time.time() - 7 * 3600)
+    assert history.latest(make_key()) is None
+    history.add(make_key(), make_batch([450]), "high", 8, time.time() - 3600)
+    assert history.latest(make_key()).buying_time == "high"  # type: ignore
+    history.max_age_hours = 0
+    assert history.latest(make_key()) is None
+
+
+def test_median_price_over_dates_and_fetch_times(tmp_path):
+    history = PriceHistory(str(tmp_path / "history.sqlite3"))
+    now = time.time()
+    history.add(make_key(2), make_batch([100, 200]), "typical", 8, now)
+    history.add(make_key(30), make_batch([300]), "typical", 8, now - 86400)
+    history.add(make_key(14), make_batch([900]), "typical", 8, now - 100 * 86400)
+    history.add(make_key(14, destination="JFK"), make_batch([50]), "low", 8, now)
+    august = ("AMS", "NBO", pendulum.date(2030, 8, 1), None, 2)
+    history.add(august, make_batch([999]), "high", 8, now)
+
+    # round trips, other party sizes and other seats are different prices
+    history.add(make_key(2, return_day=9), make_batch([700]), "typical", 8, now)
+    history.add(make_key(2, passengers=4), make_batch([800]), "typical", 8, now)
+    history.add(make_key(2), make_batch([5000]), "typical", 8, now, "business")
+
+    start, end = pendulum.date(2030, 7, 1), pendulum.date(2030, 7, 31)
+    prices = history.prices("ams", "nbo", start, end, passengers=2)
+    assert sorted(prices) == [100, 200, 300, 900]
+    # the search of 100 days ago is too old
+    assert history.median_price("AMS", "NBO", start, end, days=90, passengers=2) == 200
+    assert history.median_price("AMS", "LHR", start, end) is None
+    # without a party size, prices are per person
+    assert sorted(history.prices("AMS", "NBO", start, end, days=90)) == [
+        50,
+        100,
+        150,
+        200,
+    ]
+    assert history.median_price("AMS", "NBO", start, end, round_trip=True) == 350
+    assert history.median_price("AMS", "NBO", start, end, seat="business") == 2500
+
+
+def test_history_without_seats_is_upgraded(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute(
+            "CREATE TABLE searches ("
+            + ", ".join(name for name in FIELDS if name != "seat")
+            + ")"
+        )
+    history = PriceHistory(path)
+    history.add(make_key(), make_batch([400]), "typical", 8)
+    assert history.prices("AMS", "NBO", july, july, passengers=2).tolist() == [400]
+
+
+def test_empty_search_is_stored(tmp_path):
+    history = PriceHistory(str(tmp_path / "history.sqlite3"), max_age_hours=1)
+    history.add(make_key(), FlightBatch(), "typical", 8)
+    stored = history.latest(make_key())
+    assert stored is not None
+    assert len(FlightBatch(**stored.columns)) == 0
+
+
+def test_get_parsed_flights_reuses_history(tmp_path, monkeypatch):
+    history = PriceHistory(str(tmp_path / "history.sqlite3"))
+    monkeypatch.setattr(src.flights, "price_history", history)
+    searched = []
+
+    def fake_search(request):
+        searched.append(request)
+        # the second search is served from the search cache
+        fetched = None if searched[1:] else time.time()
+        return make_batch([400, 410]), "typical", 8, fetched
+
+    monkeypatch.setattr(src.flights, "search_parsed_flights", fake_search)
+    request = FlightRequest(
+        departure_airport="AMS",
+        arrival_airport="NBO",
+        family_size=2,
+        host_currency=Currency("Euro", "€", "EUR"),
+        departure_date=july,
+        return_date=None,
+    )
+    get_parsed_flights(request)
+    get_parsed_flights(request)
+    assert len(searched) == 2
+    # only the search that was fetched from the provider is stored
+    # a route of 8 hours is searched in business class
+    assert len(history.prices("AMS", "NBO", july, july, seat="business")) == 2
+
+    history.max_age_hours = 1
+
+    batch, buying_time, duration = get_parsed_flights(request)
+    assert len(searched) == 2
+    assert np.array_equal(batch.price, [400, 410])
+    assert (buying_time, duration) == ("typical", 8)
@@ -0,0 +1,75 @@
+import pandas
+import pendulum
+import pytest
+
+from src.input import iter_requests, iter_sheets, parse_df, parse_row
+
+
+def make_sheet() -> pandas.DataFrame:
+    today = pendulum.today()
+    soon = pandas.Timestamp(today.add(days=30).date())
+    later = pandas.Timestamp(today.add(days=40).date())
+    past = pandas.Timestamp(today.subtract(days=3).date())
+    rows = [
+        ("mario rossi", "AMS", soon, "JFK", later, 2, "usd"),
+        ("luigi", "AMS", soon, "BKK", pandas.NaT, 1.0, "EUR"),
+        ("peach", "ams", soon, "JFK", later, 2, "USD"),
+        ("daisy", "AMS", past, "JFK", pandas.NaT, 2, "USD"),
+        ("yoshi", "AMS", later, "JFK", soon, 2, "USD"),
+        ("toad", "AMS", soon, "JFK", later, 2.5, "USD"),
+        ("wario", "AMS", soon, "JFK", later, 0, "USD"),
+        ("bowser", "AMS", soon, "XXX", later, 2, "USD"),
+        ("koopa", "AMS", soon, "LHR", later, 2, "ABC"),
+        ("toadette", "AMS", soon, "LHR", later, "2.0", "EUR"),
+        ("birdo", "AMS", soon, "LHR", pandas.NaT, 3.0, "EUR"),
+    ]
+    return pandas.DataFrame(
+        rows,
+        columns=[
+            "Name",
+            "Departure_Airport_Code",
+            "Departure_Date",
+            "Arrival_Airport_Code",
+            "Return_Date",
+            "Amount_Of_Passengers",
+            "Home_Currency",
+        ],
+    )
+
+
+def test_parse_df_matches_row_by_row_validation():
+    df = make_sheet()
+    expected = [parse_row(entry) for _, entry in df.iterrows()]
+    parsed = parse_df(df)
+
+    assert parsed == expected
+    assert [name for name, _ in parsed] == ["Mario Rossi", "Luigi"] + ["Error"] * 7 + [
+        "Toadette",
+        "Birdo",
+    ]
+    assert [request.family_size for _, request in parsed[-2:]] == [2, 3]
+    assert parsed[0][1].host_currency.abbreviation == "USD"
+    assert parsed[1][1].return_date is None
+
+
+def test_iter_requests_reads_csv_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = make_sheet()
+    df.to_csv(tmp_path / "input.csv", index=False)
+
+    chunks = list(iter_sheets(chunksize=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 3]
+    assert list(iter_requests(chunksize=4)) == parse_df(df)
+
+
+def test_iter_sheets_without_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        list(iter_sheets())
+
+
+def test_unreadable_dates_are_invalid():
+    df = make_sheet().iloc[:2].astype({"Departure_Date": object, "Return_Date": object})
+    df.loc[0, "Return_Date"] = "not a date"
+    df.loc[1, "Departure_Date"] = "someday"
+    assert parse_df(df) == [("Error", None), ("Error", None)]
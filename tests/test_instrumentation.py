@@ -0,0 +1,53 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from src.instrumentation import Instrumentation
+
+
+def test_disabled_records_nothing():
+    instrumentation = Instrumentation()
+    with instrumentation.span("search"):
+        pass
+    instrumentation.count("cache_hits")
+    assert instrumentation.spans == {}
+    assert instrumentation.counters == {}
+
+
+def test_spans_and_counters_from_threads():
+    instrumentation = Instrumentation(enabled=True)
+
+    def work(_):
+        with instrumentation.span("search"):
+            instrumentation.count("provider_calls")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(work, range(100)))
+    assert instrumentation.spans["search"].count == 100
+    assert instrumentation.counters["provider_calls"] == 100
+    assert "search" in instrumentation.summary()
+
+
+def test_span_records_failed_stage():
+    instrumentation = Instrumentation(enabled=True)
+    try:
+        with instrumentation.span("probe"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert instrumentation.spans["probe"].count == 1
+
+
+def test_export(tmp_path):
+    instrumentation = Instrumentation(enabled=True)
+    with instrumentation.span("advice"):
+        instrumentation.count("flights_parsed", 12)
+
+    instrumentation.export(str(tmp_path / "stats.json"))
+    data = json.loads((tmp_path / "stats.json").read_text())
+    assert data["spans"]["advice"]["count"] == 1
+    assert data["counters"] == {"flights_parsed": 12}
+
+    instrumentation.export(str(tmp_path / "stats.prom"))
+    text = (tmp_path / "stats.prom").read_text()
+    assert 'hla_tool_stage_seconds_count{stage="advice"} 1' in text
+    assert "hla_tool_flights_parsed_total 12" in text
@@ -0,0 +1,73 @@
+import pendulum
+
+import src.batch
+from src.analysis import Advice
+from src.batch import fetch_requests
+from src.flights import Currency, FlightBatch, FlightRequest, ParsedFlight
+from src.journal import RunJournal
+
+request = FlightRequest(
+    departure_airport="AMS",
+    arrival_airport="JFK",
+    family_size=2,
+    host_currency=Currency("US Dollar", "$", "USD"),
+    departure_date=pendulum.date(2030, 7, 13),
+    return_date=pendulum.date(2030, 7, 27),
+)
+flights = FlightBatch.from_parsed(
+    [
+        ParsedFlight(
+            name="KLM",
+            departure=pendulum.datetime(2030, 7, 13, 10, 30, tz="Europe/Amsterdam"),
+            arrival=pendulum.datetime(2030, 7, 13, 12, 45, tz="America/New_York"),
+            stops=0,
+            price=450.0,
+        )
+    ]
+)
+advice = Advice(
+    pareto_flights=[],
+    pareto_path=None,
+    name="Mario",
+    request=request,
+    departure_date_str="Jul 13, 2030",
+    return_date_str="Jul 27, 2030",
+    buying_time="typical",
+    avg_duration=8,
+)
+
+
+def test_resume_skips_finished_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    journal.append("Mario", request, (flights, "typical", 8), advice)
+    with open(path, "a") as f:
+        f.write('{"key": "cut short')
+
+    searched = []
+
+    def fake_get_parsed_flights(request: FlightRequest):
+        searched.append(request.arrival_airport)
+        return FlightBatch(), "low", 1.0
+
+    monkeypatch.setattr(src.batch, "get_parsed_flights", fake_get_parsed_flights)
+    other = FlightRequest(
+        "AMS", "LHR", 1, request.host_currency, request.departure_date, None
+    )
+    resumed = RunJournal(path, resume=True)
+    results = list(
+        fetch_requests([("Mario", request), ("Luigi", other)], lookup=resumed.get)
+    )
+
+    assert searched == ["LHR"]
+    batch, buying_time, avg_duration = results[0][3]
+    assert (buying_time, avg_duration) == ("typical", 8)
+    assert batch.flights == flights.flights
+    assert resumed.get("Luigi", request) is None
+
+
+def test_new_run_starts_with_empty_journal(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    RunJournal(path).append("Mario", request, (flights, "typical", 8), advice)
+    assert RunJournal(path).get("Mario", request) is None
+    assert RunJournal(path, resume=True).finished == {}
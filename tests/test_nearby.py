@@ -0,0 +1,42 @@
+import pendulum
+
+from src.flights import Currency, FlightRequest
+from src.nearby import expand_airports, get_nearby_advice
+from tests.conftest import make_batch
+
+request = FlightRequest(
+    departure_airport="AMS",
+    arrival_airport="JFK",
+    family_size=1,
+    host_currency=Currency("Euro", "€", "EUR"),
+    departure_date=pendulum.date(2030, 7, 13),
+    return_date=None,
+)
+
+
+def test_expand_airports():
+    routes = expand_airports(request, 100, limit=2)
+    assert routes[0] == request
+    assert len(routes) == 9
+    assert {route.arrival_airport for route in routes} >= {"JFK", "LGA"}
+    assert all(route.departure_date == request.departure_date for route in routes)
+    assert expand_airports(request, 100, limit=0) == [request]
+
+
+def test_nearby_advice_merges_routes_of_the_same_class():
+    routes = expand_airports(request, 100, limit=1)
+    assert len(routes) == 4
+    results = [
+        (make_batch([900, 950, 1000]), "typical", 8),
+        (make_batch([800, 850, 900]), "low", 8),
+        None,
+        # a route short enough for economy class is not merged
+        (make_batch([100, 150, 200]), "low", 4),
+    ]
+    advice = get_nearby_advice(
+        routes, results, "plot.png", "mario", request, None, "typst"
+    )
+    assert advice is not None
+    assert advice.buying_time == "typical"
+    assert advice.routes == ["AMS-JFK", f"AMS-{routes[1].arrival_airport}"]
+    assert min(flight.price for flight in advice.pareto_flights) == 800
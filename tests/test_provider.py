@@ -0,0 +1,213 @@
+import primp
+import pytest
+from fast_flights import FlightData, Passengers
+
+import src.flights
+from src.flights import configure_cache, configure_provider, search_flights
+from src.provider import (
+    AdaptiveProvider,
+    NoFlightsFound,
+    ProviderThrottled,
+    RecordingProvider,
+    ReplayProvider,
+    is_provider_failure,
+)
+from tests.conftest import make_result
+
+
+def make_search(date: str) -> tuple:
+    flight_data = FlightData(date=date, from_airport="AMS", to_airport="JFK")
+    return [flight_data], "one-way", "economy", Passengers(adults=2)
+
+
+class FakeProvider:
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, flight_data, trip, seat, passengers, max_stops=None):
+        self.calls += 1
+        return make_result(f"€{400 + self.calls}")
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    path = str(tmp_path / "recordings.jsonl")
+    recorder = RecordingProvider(path, FakeProvider())
+    recorder.search(*make_search("2025-07-13"))
+    recorder.search(*make_search("2025-07-14"))
+    return path
+
+
+def test_replay_serves_recorded_results(recordings):
+    replay = ReplayProvider(recordings, strict=True)
+    assert replay.search(*make_search("2025-07-13")) == make_result("€401")
+    assert replay.search(*make_search("2025-07-14")) == make_result("€402")
+    with pytest.raises(LookupError):
+        replay.search(*make_search("2025-07-15"))
+
+
+def test_replay_falls_back_to_a_recorded_result(recordings):
+    replay = ReplayProvider(recordings)
+    result = replay.search(*make_search("2025-07-15"))
+    assert result in (make_result("€401"), make_result("€402"))
+    assert replay.search(*make_search("2025-07-15")) == result
+
+
+def test_replay_latency_and_errors(recordings):
+    sleeps = []
+    replay = ReplayProvider(
+        recordings, latency=0.5, jitter=0.1, error_rate=1, sleep=sleeps.append
+    )
+    with pytest.raises(RuntimeError):
+        replay.search(*make_search("2025-07-13"))
+    assert 0.5 <= sleeps[0] <= 0.6
+
+
+def test_replay_throttles_above_rate(recordings):
+    now = [0.0]
+    replay = ReplayProvider(
+        recordings,
+        max_requests_per_minute=2,
+        clock=lambda: now[0],
+        sleep=lambda _: None,
+    )
+    replay.search(*make_search("2025-07-13"))
+    replay.search(*make_search("2025-07-13"))
+    with pytest.raises(ProviderThrottled):
+        replay.search(*make_search("2025-07-13"))
+    now[0] = 61
+    assert replay.search(*make_search("2025-07-13")) == make_result("€401")
+
+
+def test_search_flights_uses_configured_provider(tmp_path, recordings, monkeypatch):
+    monkeypatch.setattr(src.flights, "provider", src.flights.provider)
+    monkeypatch.setattr(src.flights, "search_cache", src.flights.search_cache)
+    monkeypatch.setattr(src.flights, "route_durations", src.flights.route_durations)
+    monkeypatch.setattr(src.flights, "price_history", src.flights.price_history)
+    configure_provider(ReplayProvider(recordings, strict=True), str(tmp_path))
+    configure_cache(mode="use")
+    assert search_flights(*make_search("2025-07-14")) == make_result("€402")
+    # the second search is served from the replay cache
+    src.flights.provider = ReplayProvider(recordings, error_rate=1)
+    assert search_flights(*make_search("2025-07-14")) == make_result("€402")
+
+
+class ScriptedProvider:
+    def __init__(self, clock: list[float], seconds: float, works: bool = True):
+        self.clock = clock
+        self.seconds = seconds
+        self.works = works
+        self.calls = 0
+
+    def search(self, flight_data, trip, seat, passengers, max_stops=None):
+        self.calls += 1
+        self.clock[0] += self.seconds
+        if not self.works:
+            raise AssertionError("429 Result: blocked")
+        return make_result("€450")
+
+
+def test_adaptive_provider_prefers_cheap_backend():
+    clock = [0.0]
+    http = ScriptedProvider(clock, 1)
+    browser = ScriptedProvider(clock, 5)
+    provider = AdaptiveProvider(
+        [("http", http, 1), ("browser", browser, 5)], clock=lambda: clock[0]
+    )
+    for _ in range(10):
+        assert provider.search(*make_search("2025-07-13")) == make_result("€450")
+    assert (http.calls, browser.calls) == (10, 0)
+
+
+def test_adaptive_provider_escalates_and_adapts():
+    clock = [0.0]
+    http = ScriptedProvider(clock, 1, works=False)
+    browser = ScriptedProvider(clock, 5)
+    provider = AdaptiveProvider(
+        [("http", http, 1), ("browser", browser, 5)],
+        probe_every=10,
+        clock=lambda: clock[0],
+    )
+    for _ in range(40):
+        assert provider.search(*make_search("2025-07-13")) == make_result("€450")
+    assert browser.calls == 40
+    # http is given up on after a few failures, and only probed now and then
+    assert 5 <= http.calls <= 12
+    assert provider.stats["http"].success_rate < 0.2
+
+    http.works = True
+    for _ in range(40):
+        provider.search(*make_search("2025-07-13"))
+    assert provider.stats["http"].success_rate > 0.9
+    assert browser.calls < 60
+
+
+def test_adaptive_provider_raises_when_all_fail():
+    clock = [0.0]
+    provider = AdaptiveProvider(
+        [
+            ("http", ScriptedProvider(clock, 1, works=False), 1),
+            ("browser", ScriptedProvider(clock, 5, works=False), 5),
+        ],
+        clock=lambda: clock[0],
+    )
+    with pytest.raises(AssertionError):
+        provider.search(*make_search("2025-07-13"))
+    assert "browser: 1 searches, 1 failed" in provider.summary()
+
+
+class NonstopProvider:
+    """Finds no nonstop flights, like Google Flights on a route without them."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, flight_data, trip, seat, passengers, max_stops=None):
+        self.calls += 1
+        raise NoFlightsFound("No flights found")
+
+
+def make_nonstop_search(date: str) -> tuple:
+    flight_data = FlightData(
+        date=date, from_airport="AMS", to_airport="NBO", max_stops=0
+    )
+    return [flight_data], "one-way", "economy", Passengers(adults=1)
+
+
+def test_adaptive_provider_answers_nonstop_searches():
+    clock = [0.0]
+    http = NonstopProvider()
+    browser = NonstopProvider()
+    provider = AdaptiveProvider(
+        [("http", http, 1), ("browser", browser, 5)], clock=lambda: clock[0]
+    )
+    with pytest.raises(NoFlightsFound):
+        provider.search(*make_nonstop_search("2025-07-13"))
+    assert (http.calls, browser.calls) == (1, 0)
+    assert provider.stats["http"].failures == 0
+
+
+def test_empty_nonstop_search_is_not_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.flights, "provider", src.flights.provider)
+    monkeypatch.setattr(src.flights, "search_cache", src.flights.search_cache)
+    monkeypatch.setattr(src.flights, "route_durations", src.flights.route_durations)
+    monkeypatch.setattr(src.flights, "price_history", src.flights.price_history)
+    monkeypatch.setattr(src.flights, "provider_limiter", src.flights.provider_limiter)
+    nonstop = NonstopProvider()
+    configure_provider(nonstop, str(tmp_path))
+    limiter = src.flights.configure_rate_limit(30, 5, 3)
+    result = search_flights(*make_nonstop_search("2025-07-13"), allow_empty=True)
+    assert result.flights == []
+    assert nonstop.calls == 1
+    assert limiter.metrics.retries == 0
+    assert limiter.bucket.rate == pytest.approx(0.5)
+
+
+def test_provider_failures():
+    assert is_provider_failure(AssertionError("429 Result: ..."))
+    assert is_provider_failure(ProviderThrottled("429 Too Many Requests"))
+    assert is_provider_failure(TimeoutError())
+    assert is_provider_failure(primp.ConnectError("connection refused"))
+    assert not is_provider_failure(ModuleNotFoundError("No module named 'playwright'"))
+    assert not is_provider_failure(LookupError("No recorded flight search"))
+    assert not is_provider_failure(ValueError("Invalid airport code"))
@@ -0,0 +1,95 @@
+import pytest
+
+from src.ratelimit import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    clock = FakeClock()
+    bucket = TokenBucket(
+        requests_per_minute=60, burst=3, clock=clock, sleep=clock.sleep
+    )
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_token_bucket_slows_down_and_recovers():
+    bucket = TokenBucket(requests_per_minute=60, burst=1)
+    bucket.slow_down()
+    assert bucket.rate == pytest.approx(0.5)
+    bucket.speed_up(step_requests_per_minute=60)
+    assert bucket.rate == pytest.approx(1.0)
+
+
+def test_rate_limiter_retries_errors_and_empty_results():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        requests_per_minute=600, burst=10, retries=3, clock=clock, sleep=clock.sleep
+    )
+    responses = iter([AssertionError("429"), [], ["flight"]])
+
+    def call():
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert limiter.call(call, is_empty=lambda result: not result) == ["flight"]
+    assert limiter.metrics.calls == 3
+    assert limiter.metrics.retries == 2
+    assert limiter.metrics.failures == 0
+
+
+def test_rate_limiter_gives_up_after_retries():
+    clock = FakeClock()
+    limiter = RateLimiter(retries=1, clock=clock, sleep=clock.sleep)
+
+    def call():
+        raise RuntimeError("No flights found")
+
+    with pytest.raises(RuntimeError):
+        limiter.call(call)
+    assert limiter.metrics.calls == 2
+    assert limiter.metrics.failures == 1
+    assert limiter.metrics.throttled_seconds <= limiter.base_delay
+
+
+def test_rate_limiter_raises_answers_at_once():
+    clock = FakeClock()
+    limiter = RateLimiter(retries=3, clock=clock, sleep=clock.sleep)
+
+    def call():
+        raise LookupError("no nonstop flights")
+
+    with pytest.raises(LookupError):
+        limiter.call(call, is_answer=lambda e: isinstance(e, LookupError))
+    assert limiter.metrics.calls == 1
+    assert limiter.metrics.failures == 0
+    assert limiter.bucket.rate == pytest.approx(limiter.bucket.requests_per_minute / 60)
+
+
+def test_rate_limiter_raises_other_errors_at_once():
+    clock = FakeClock()
+    limiter = RateLimiter(retries=3, clock=clock, sleep=clock.sleep)
+
+    def call():
+        raise ModuleNotFoundError("No module named 'playwright'")
+
+    with pytest.raises(ModuleNotFoundError):
+        limiter.call(call)
+    assert limiter.metrics.calls == 1
+    assert limiter.metrics.retries == 0
+    assert limiter.metrics.failures == 1
+    assert limiter.bucket.rate == pytest.approx(limiter.bucket.requests_per_minute / 60)
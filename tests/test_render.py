@@ -0,0 +1,25 @@
+import numpy as np
+
+from src.render import PlotJob, Renderer, get_figure
+
+
+def make_job(path: str) -> PlotJob:
+    minutes = np.array([300, 400, 500])
+    prices = np.array([900.0, 700.0, 800.0])
+    return PlotJob(minutes, prices, minutes[:2], prices[:2], path, "AMS-JFK")
+
+
+def test_renderer_writes_plots(tmp_path):
+    for workers in [0, 2]:
+        paths = [str(tmp_path / f"{workers}_{i}.png") for i in range(3)]
+        with Renderer(workers) as renderer:
+            for path in paths:
+                renderer.submit(make_job(path))
+        for path in paths:
+            with open(path, "rb") as f:
+                assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+
+
+def test_figure_is_reused():
+    assert get_figure() is get_figure()
+    assert not get_figure().axes
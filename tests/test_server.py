@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import src.server
+from src.server import LookupQueue, make_server
+from tests.conftest import make_batch
+
+ROW = {
+    "name": "mario",
+    "departure_airport": "ams",
+    "arrival_airport": "JFK",
+    "family_size": 2,
+    "host_currency": "EUR",
+    "departure_date": "2030-07-13",
+}
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    searched = []
+
+    def fake_search(request):
+        searched.append(request)
+        time.sleep(0.05)
+        return make_batch([400, 410, 420, 430]), "typical", 8
+
+    monkeypatch.setattr(src.server, "get_parsed_flights", fake_search)
+    return searched
+
+
+@pytest.fixture
+def url(searches):
+    server, queue = make_server("127.0.0.1", 0, max_workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    queue.close()
+
+
+def post(url: str, body) -> tuple[int, object]:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_advice_for_one_request(url, searches):
+    status, body = post(url + "/advice", ROW)
+    assert status == 200
+    assert len(body) == 1
+    assert body[0]["name"] == "mario"
+    advice = body[0]["advice"]
+    assert advice["name"] == "Mario"
+    assert advice["buying_time"] == "typical"
+    assert searches[0].departure_airport == "AMS"
+
+
+def test_batch_reports_invalid_rows_in_order(url, searches):
+    invalid = dict(ROW, name="luigi", departure_airport="XXXX")
+    status, body = post(url + "/advice", {"requests": [invalid, ROW, ROW]})
+    assert status == 200
+    assert [entry["name"] for entry in body] == ["luigi", "mario", "mario"]
+    assert "error" in body[0]
+    assert "advice" in body[1] and "advice" in body[2]
+    # identical requests in flight at the same time are searched once
+    assert len(searches) == 1
+
+
+def test_bad_json_and_unknown_paths(url):
+    request = urllib.request.Request(url + "/advice", data=b"{not json")
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(request)
+    assert e.value.code == 400
+    assert post(url + "/nothing", ROW)[0] == 404
+
+
+def test_health(url):
+    with urllib.request.urlopen(url + "/health") as response:
+        body = json.load(response)
+    assert body["status"] == "ok"
+    assert "calls" in body["provider"]
+
+
+def test_lookup_queue_shares_pending_searches(searches):
+    queue = LookupQueue(2)
+    request = src.server.validate_row(src.server.to_row(ROW))[1]
+    first, second = queue.submit(request), queue.submit(request)
+    assert first is second
+    first.result()
+    queue.close()
+    assert len(searches) == 1
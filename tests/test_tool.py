@@ -0,0 +1,80 @@
+import importlib.util
+from pathlib import Path
+
+import pendulum
+
+import src.analysis
+import src.batch
+from src.flights import Currency, FlightBatch, FlightRequest
+from src.instrumentation import instrumentation
+from src.journal import RunJournal
+from tests.conftest import make_batch
+
+ROOT = Path(__file__).parent.parent
+
+
+def load_tool():
+    spec = importlib.util.spec_from_file_location("hla_tool", ROOT / "HLA-tool.py")
+    module = importlib.util.module_from_spec(spec)  # type: ignore
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+def make_request(arrival: str) -> FlightRequest:
+    return FlightRequest(
+        departure_airport="AMS",
+        arrival_airport=arrival,
+        family_size=2,
+        host_currency=Currency("Euro", "€", "EUR"),
+        departure_date=pendulum.date(2030, 7, 13),
+        return_date=None,
+    )
+
+
+def test_rows_without_flights_are_skipped(monkeypatch):
+    def fake_search(request: FlightRequest):
+        if request.arrival_airport == "NBO":
+            return FlightBatch(), "typical", 8
+        return make_batch([400, 410, 420]), "typical", 8
+
+    monkeypatch.setattr(src.batch, "get_parsed_flights", fake_search)
+    tool = load_tool()
+    requests = [("Mario", make_request("NBO")), ("Luigi", make_request("JFK"))]
+    advices = tool.analyze_request(requests, charts="typst")
+    assert [advice.name for advice in advices] == ["Luigi"]
+
+
+def test_resumed_rows_are_not_journaled_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        src.batch,
+        "get_parsed_flights",
+        lambda request: (make_batch([400, 410, 420]), "typical", 8),
+    )
+    tool = load_tool()
+    path = str(tmp_path / "journal.jsonl")
+    requests = [("Mario", make_request("JFK"))]
+    tool.analyze_request(requests, charts="typst", journal=RunJournal(path))
+    tool.analyze_request(
+        requests, charts="typst", journal=RunJournal(path, resume=True)
+    )
+    with open(path) as f:
+        assert len(f.readlines()) == 1
+
+
+def test_stats_report_plots_of_the_render_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        src.batch,
+        "get_parsed_flights",
+        lambda request: (make_batch([400, 410, 420]), "typical", 8),
+    )
+    monkeypatch.setattr(src.analysis, "get_template_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(instrumentation, "enabled", True)
+    monkeypatch.setattr(instrumentation, "spans", {})
+    monkeypatch.setattr(instrumentation, "counters", {})
+    tool = load_tool()
+    requests = [("Mario", make_request("JFK")), ("Luigi", make_request("LHR"))]
+    tool.analyze_request(requests, render_workers=2, charts="png")
+    assert instrumentation.spans["plot"].count == 2
+    assert any(
+        line.startswith("plot ") for line in instrumentation.summary().split("\n")
+    )